@@ -1,5 +1,5 @@
 // src/components/MyDebatesPage.js
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth0 } from '@auth0/auth0-react'; // Import useAuth0
 import { authenticatedFetch } from '../services/api'; // Import your helper
@@ -9,10 +9,26 @@ import './MyDebatesPage.css';
 
 function MyDebatesPage() {
   const [debatesList, setDebatesList] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null); // Cursor for the next page, null when there are no more
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState(null);
+  const [loadMoreError, setLoadMoreError] = useState(null);
   const { getAccessTokenSilently, isAuthenticated } = useAuth0(); // Get token function and auth state
 
+  // The backend returns debates a page at a time, with next_cursor pointing at the next page.
+  const fetchDebatesPage = useCallback(async (cursor) => {
+    const path = cursor
+      ? `/get_user_debates?cursor=${encodeURIComponent(cursor)}`
+      : '/get_user_debates';
+    const data = await authenticatedFetch(
+      path,
+      {}, // No options needed for a GET request
+      getAccessTokenSilently
+    );
+    return { debates: data.debates || [], nextCursor: data.next_cursor || null };
+  }, [getAccessTokenSilently]);
+
   useEffect(() => {
     const fetchDebates = async () => {
       if (!isAuthenticated) { // Don't fetch if not authenticated
@@ -26,13 +42,9 @@ function MyDebatesPage() {
       try {
         // Backend should use the JWT to identify the user.
         // No user_id query parameter is needed anymore.
-        // Ensure your backend endpoint /get_user_debates is updated accordingly.
-        const data = await authenticatedFetch(
-          '/get_user_debates', // Assuming your backend route is /get_user_debates
-          {}, // No options needed for a GET request
-          getAccessTokenSilently
-        );
-        setDebatesList(data.debates || []);
+        const page = await fetchDebatesPage(null);
+        setDebatesList(page.debates);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error("Failed to fetch debates:", err);
         setError(err.message || "Could not load debates. You might need to log in again.");
@@ -42,7 +54,24 @@ function MyDebatesPage() {
     };
 
     fetchDebates();
-  }, [getAccessTokenSilently, isAuthenticated]); // Re-fetch if auth state or token function changes
+  }, [fetchDebatesPage, isAuthenticated]); // Re-fetch if auth state or token function changes
+
+  const loadMoreDebates = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    setLoadMoreError(null);
+    try {
+      const page = await fetchDebatesPage(nextCursor);
+      setDebatesList(prevDebates => [...prevDebates, ...page.debates]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Failed to fetch more debates:", err);
+      // Keep the debates already shown; the button stays so the user can retry.
+      setLoadMoreError(err.message || "Could not load more debates.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   if (isLoading) {
     return <div className="App-main loading-indicator" style={{ textAlign: 'center', padding: '2rem', fontSize: '1.5em' }}>Loading My Debates...</div>;
@@ -80,6 +109,18 @@ function MyDebatesPage() {
           ))}
         </div>
       )}
+      {nextCursor && (
+        <div className="load-more-section">
+          {loadMoreError && <p className="error-message">Error: {loadMoreError}</p>}
+          <button
+            className="load-more-button"
+            onClick={loadMoreDebates}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? "Loading..." : "Load More Debates"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -0,0 +1,38 @@
+"""timestamps and indexes
+
+Revision ID: 2a6d9e4b7c31
+Revises: 9b4e2c7f0a18
+Create Date: 2026-10-17 17:48:12.906734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a6d9e4b7c31'
+down_revision: Union[str, None] = '9b4e2c7f0a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.add_column('debate', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    # debate.user_id is served by ix_debate_user_id_created_at_id, whose
+    # leading column it is. debate_log, chat_message and idempotency_key lookups
+    # use their primary keys. The job foreign keys had no index, so deleting a
+    # user or debate scanned the whole job table.
+    op.create_index(op.f('ix_job_user_id'), 'job', ['user_id'], unique=False)
+    op.create_index(op.f('ix_job_debate_id'), 'job', ['debate_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_job_debate_id'), table_name='job')
+    op.drop_index(op.f('ix_job_user_id'), table_name='job')
+    op.drop_column('debate', 'updated_at')
+    op.drop_column('user', 'created_at')
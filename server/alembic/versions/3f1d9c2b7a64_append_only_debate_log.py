@@ -0,0 +1,106 @@
+"""append only debate log
+
+Revision ID: 3f1d9c2b7a64
+Revises: ac7291795ae2
+Create Date: 2026-10-16 09:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1d9c2b7a64'
+down_revision: Union[str, None] = 'ac7291795ae2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('debate_log',
+    sa.Column('debate_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('speaker', sa.String(), nullable=False),
+    sa.Column('response_type', sa.String(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['debate_id'], ['debate.id'], ),
+    sa.PrimaryKeyConstraint('debate_id', 'seq')
+    )
+    op.create_table('chat_message',
+    sa.Column('debate_id', sa.Integer(), nullable=False),
+    sa.Column('side', sa.String(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('content', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['debate_id'], ['debate.id'], ),
+    sa.PrimaryKeyConstraint('debate_id', 'side', 'seq')
+    )
+
+    # Backfill from the JSON columns, keeping each array's order as seq.
+    op.execute(
+        """
+        INSERT INTO debate_log (debate_id, seq, speaker, response_type, text)
+        SELECT debate.id, entry.ordinality - 1,
+               entry.value ->> 'speaker',
+               entry.value ->> 'response_type',
+               entry.value ->> 'text'
+        FROM debate,
+             json_array_elements(debate.logs) WITH ORDINALITY AS entry(value, ordinality)
+        WHERE debate.logs IS NOT NULL
+        """
+    )
+    for side in ('pro', 'con'):
+        op.execute(
+            f"""
+            INSERT INTO chat_message (debate_id, side, seq, content)
+            SELECT debate.id, '{side}', message.ordinality - 1, message.value
+            FROM debate,
+                 json_array_elements(debate.{side}_chat_history)
+                     WITH ORDINALITY AS message(value, ordinality)
+            WHERE debate.{side}_chat_history IS NOT NULL
+            """
+        )
+
+    op.drop_column('debate', 'logs')
+    op.drop_column('debate', 'pro_chat_history')
+    op.drop_column('debate', 'con_chat_history')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('debate', sa.Column('logs', sa.JSON(), nullable=True))
+    op.add_column('debate', sa.Column('pro_chat_history', sa.JSON(), nullable=True))
+    op.add_column('debate', sa.Column('con_chat_history', sa.JSON(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE debate SET logs = (
+            SELECT json_agg(
+                json_build_object(
+                    'speaker', debate_log.speaker,
+                    'response_type', debate_log.response_type,
+                    'text', debate_log.text
+                )
+                ORDER BY debate_log.seq
+            )
+            FROM debate_log
+            WHERE debate_log.debate_id = debate.id
+        )
+        """
+    )
+    for side in ('pro', 'con'):
+        op.execute(
+            f"""
+            UPDATE debate SET {side}_chat_history = (
+                SELECT json_agg(chat_message.content ORDER BY chat_message.seq)
+                FROM chat_message
+                WHERE chat_message.debate_id = debate.id
+                  AND chat_message.side = '{side}'
+            )
+            """
+        )
+
+    op.drop_table('chat_message')
+    op.drop_table('debate_log')
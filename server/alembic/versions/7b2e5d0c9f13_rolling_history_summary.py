@@ -0,0 +1,34 @@
+"""rolling history summary
+
+Revision ID: 7b2e5d0c9f13
+Revises: 3f1d9c2b7a64
+Create Date: 2026-10-16 11:02:17.540982
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e5d0c9f13'
+down_revision: Union[str, None] = '3f1d9c2b7a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('debate', sa.Column('pro_history_summary', sa.Text(), nullable=True))
+    op.add_column('debate', sa.Column('con_history_summary', sa.Text(), nullable=True))
+    op.add_column('debate', sa.Column('pro_summarized_through', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('debate', sa.Column('con_summarized_through', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('debate', 'con_summarized_through')
+    op.drop_column('debate', 'pro_summarized_through')
+    op.drop_column('debate', 'con_history_summary')
+    op.drop_column('debate', 'pro_history_summary')
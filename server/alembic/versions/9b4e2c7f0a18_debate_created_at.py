@@ -0,0 +1,31 @@
+"""debate created_at
+
+Revision ID: 9b4e2c7f0a18
+Revises: 5d2f8b6a1e39
+Create Date: 2026-10-17 16:05:33.480271
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e2c7f0a18'
+down_revision: Union[str, None] = '5d2f8b6a1e39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing debates all get the migration time; id keeps their order.
+    op.add_column('debate', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_debate_user_id_created_at_id', 'debate', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_debate_user_id_created_at_id', table_name='debate')
+    op.drop_column('debate', 'created_at')
@@ -0,0 +1,28 @@
+"""debate version
+
+Revision ID: e1a7c3d90b54
+Revises: c4e8a1f6b2d7
+Create Date: 2026-10-17 10:41:08.913562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c3d90b54'
+down_revision: Union[str, None] = 'c4e8a1f6b2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('debate', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('debate', 'version')
@@ -2,21 +2,140 @@ import asyncio
 from aiohttp import web
 import aiohttp_cors
 import os
+import tempfile
 import dotenv
 import logging
 from src.server.routes import setup_routes
 from aiohttp_apispec import validation_middleware, setup_aiohttp_apispec
 from src.server.auth import auth_middleware
+from src.server.utils import create_genai_client
+from src.server.response_cache import create_response_cache
+from src.server.debate import create_opening_pool
+from src.server.debate_locks import DebateLocks
+from src.server.scheduler import ModelScheduler
+from src.server.call_policy import ModelCallPolicy
+from src.server.jobs import start_job_workers
+from src.server.metrics import metrics_middleware
+from src.server.debate import spawn_background
+from src.server.tracing import (
+    RequestIdFilter,
+    add_request_id_header,
+    create_trace_exporter,
+    create_tracing_middleware,
+    install_statement_tracing,
+)
+from src.server.compression import (
+    CompressedBodyCache,
+    build_compressors,
+    create_compression_middleware,
+)
+from src.database.database import (
+    engine,
+    async_session,
+    warm_up_pool,
+    delete_expired_idempotency_keys,
+)
 
 dotenv.load_dotenv()
 
 SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.environ.get("SERVER_PORT", 8080))
+GEMINI_MAX_CONNECTIONS = int(os.environ.get("GEMINI_MAX_CONNECTIONS", 100))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("GEMINI_MAX_KEEPALIVE_CONNECTIONS", 20)
+)
+GEMINI_KEEPALIVE_EXPIRY = float(os.environ.get("GEMINI_KEEPALIVE_EXPIRY", 30))
+HISTORY_KEEP_EXCHANGES = int(os.environ.get("HISTORY_KEEP_EXCHANGES", 4))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 4000))
+JUDGE_TRANSCRIPT_TOKEN_BUDGET = int(
+    os.environ.get("JUDGE_TRANSCRIPT_TOKEN_BUDGET", 6000)
+)
+LLM_CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1000))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 3600))
+MODEL_MAX_CONCURRENCY = int(os.environ.get("MODEL_MAX_CONCURRENCY", 32))
+MODEL_RATE_LIMIT = float(os.environ.get("MODEL_RATE_LIMIT", 0))  # calls/s, 0 = off
+MODEL_RATE_BURST = int(os.environ.get("MODEL_RATE_BURST", 10))
+MODEL_MAX_QUEUE_DEPTH = int(os.environ.get("MODEL_MAX_QUEUE_DEPTH", 200))
+MODEL_CALL_TIMEOUT = float(os.environ.get("MODEL_CALL_TIMEOUT", 30))
+MODEL_CALL_MAX_RETRIES = int(os.environ.get("MODEL_CALL_MAX_RETRIES", 2))
+MODEL_CALL_BACKOFF_BASE = float(os.environ.get("MODEL_CALL_BACKOFF_BASE", 0.5))
+MODEL_CALL_BACKOFF_MAX = float(os.environ.get("MODEL_CALL_BACKOFF_MAX", 8))
+MODEL_CALL_HEDGE = os.environ.get("MODEL_CALL_HEDGE", "false").lower() == "true"
+MODEL_CALL_HEDGE_QUANTILE = float(os.environ.get("MODEL_CALL_HEDGE_QUANTILE", 0.95))
+MODEL_CALL_HEDGE_MIN_DELAY = float(os.environ.get("MODEL_CALL_HEDGE_MIN_DELAY", 0.5))
+OPENING_POOL_SIZE = int(os.environ.get("OPENING_POOL_SIZE", 3))  # 0 disables
+OPENING_POOL_HOT_THRESHOLD = int(os.environ.get("OPENING_POOL_HOT_THRESHOLD", 3))
+OPENING_POOL_HOT_WINDOW = float(os.environ.get("OPENING_POOL_HOT_WINDOW", 3600))
+OPENING_POOL_MAX_TOPICS = int(os.environ.get("OPENING_POOL_MAX_TOPICS", 200))
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_EXECUTOR_MIN_SIZE = int(
+    os.environ.get("COMPRESSION_EXECUTOR_MIN_SIZE", 64 * 1024)
+)
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 5))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+COMPRESSION_CACHE_MAX_BYTES = int(
+    os.environ.get("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)  # 0 disables
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "off").lower()  # off, file, otlp
+TRACE_FILE_PATH = os.environ.get(
+    "TRACE_FILE_PATH", os.path.join(tempfile.gettempdir(), "debates-ai-traces.jsonl")
+)
+TRACE_OTLP_ENDPOINT = os.environ.get(
+    "TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "debates-ai")
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.1))
+TRACE_EXPORT_INTERVAL = float(os.environ.get("TRACE_EXPORT_INTERVAL", 5))
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", 1000))
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))  # 0 disables
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(
+    level=logging.INFO, format="%(levelname)s:%(name)s:[%(request_id)s] %(message)s"
+)
+for log_handler in logging.getLogger().handlers:
+    log_handler.addFilter(RequestIdFilter())
 logger = logging.getLogger(__name__)
 
 
+async def warm_up_database(app: web.Application):
+    await warm_up_pool()
+
+
+async def purge_idempotency_keys(app: web.Application):
+    async with async_session() as session:
+        deleted = await delete_expired_idempotency_keys(session)
+    logger.info(f"Purged {deleted} expired idempotency keys.")
+
+
+async def cancel_background_tasks(app: web.Application):
+    for task in list(app["background_tasks"]):
+        task.cancel()
+    await asyncio.gather(*app["background_tasks"], return_exceptions=True)
+
+
+async def close_response_cache(app: web.Application):
+    if app["response_cache"] is not None:
+        await app["response_cache"].close()
+
+
+async def start_trace_exporter(app: web.Application):
+    if app["trace_exporter"] is not None:
+        spawn_background(app, app["trace_exporter"].run())
+
+
+async def close_trace_exporter(app: web.Application):
+    if app["trace_exporter"] is not None:
+        await app["trace_exporter"].close()
+
+
+async def close_genai_client(app: web.Application):
+    await app["genai_transport"].aclose()
+    logger.info("Gemini connection pool closed.")
+
+
 async def create_app() -> web.Application:
     app = web.Application()
     app["api_key"] = os.environ.get("GEMINI_API_KEY")
@@ -24,6 +143,58 @@ async def create_app() -> web.Application:
         raise ValueError("GEMINI_API_KEY not found in environment variables.")
     app["text_model_name"] = os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash")
     app["max_sentences"] = 2  # Default to 2 sentences for responses
+    app["history_keep_exchanges"] = HISTORY_KEEP_EXCHANGES
+    app["history_token_budget"] = HISTORY_TOKEN_BUDGET
+    app["judge_transcript_token_budget"] = JUDGE_TRANSCRIPT_TOKEN_BUDGET
+    app["background_tasks"] = set()
+    app["model_scheduler"] = ModelScheduler(
+        max_concurrency=MODEL_MAX_CONCURRENCY,
+        rate=MODEL_RATE_LIMIT,
+        burst=MODEL_RATE_BURST,
+        max_queue_depth=MODEL_MAX_QUEUE_DEPTH,
+    )
+    app["model_call_policy"] = ModelCallPolicy(
+        timeout=MODEL_CALL_TIMEOUT,
+        max_retries=MODEL_CALL_MAX_RETRIES,
+        backoff_base=MODEL_CALL_BACKOFF_BASE,
+        backoff_max=MODEL_CALL_BACKOFF_MAX,
+        hedge=MODEL_CALL_HEDGE,
+        hedge_quantile=MODEL_CALL_HEDGE_QUANTILE,
+        hedge_min_delay=MODEL_CALL_HEDGE_MIN_DELAY,
+    )
+    app["idempotent_requests"] = {}
+    app["debate_locks"] = DebateLocks()
+    app["job_wakeup"] = asyncio.Event()
+    app["genai_client"], app["genai_transport"] = create_genai_client(
+        app["api_key"],
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+    app.on_startup.append(warm_up_database)
+    app.on_startup.append(purge_idempotency_keys)
+    app.on_startup.append(start_job_workers)
+    app.on_cleanup.append(cancel_background_tasks)
+    app.on_cleanup.append(close_genai_client)
+    app["response_cache"] = create_response_cache(
+        LLM_CACHE_BACKEND,
+        path=LLM_CACHE_PATH,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        ttl=LLM_CACHE_TTL,
+    )
+    app.on_cleanup.append(close_response_cache)
+    app["opening_pool"] = (
+        create_opening_pool(
+            app,
+            size=OPENING_POOL_SIZE,
+            low_water=max(OPENING_POOL_SIZE // 3, 1),
+            hot_threshold=OPENING_POOL_HOT_THRESHOLD,
+            hot_window=OPENING_POOL_HOT_WINDOW,
+            max_topics=OPENING_POOL_MAX_TOPICS,
+        )
+        if OPENING_POOL_SIZE > 0
+        else None
+    )
     setup_routes(app)
     logger.info("Routes have been set up.")
     cors = aiohttp_cors.setup(
@@ -39,6 +210,44 @@ async def create_app() -> web.Application:
     )
     for route in list(app.router.routes()):
         cors.add(route)
+    app["compressed_body_cache"] = (
+        CompressedBodyCache(max_bytes=COMPRESSION_CACHE_MAX_BYTES)
+        if COMPRESSION_CACHE_MAX_BYTES > 0
+        else None
+    )
+    app["trace_exporter"] = create_trace_exporter(
+        TRACE_EXPORTER,
+        path=TRACE_FILE_PATH,
+        endpoint=TRACE_OTLP_ENDPOINT,
+        service_name=TRACE_SERVICE_NAME,
+        interval=TRACE_EXPORT_INTERVAL,
+    )
+    if app["trace_exporter"] is not None or SLOW_REQUEST_MS > 0:
+        install_statement_tracing(engine)
+    app.on_startup.append(start_trace_exporter)
+    app.on_cleanup.append(close_trace_exporter)
+    app.on_response_prepare.append(add_request_id_header)
+    app.middlewares.append(
+        create_tracing_middleware(
+            app["trace_exporter"],
+            sample_rate=TRACE_SAMPLE_RATE,
+            slow_request_ms=SLOW_REQUEST_MS,
+            max_spans=TRACE_MAX_SPANS,
+        )
+    )
+    app.middlewares.append(metrics_middleware)
+    app.middlewares.append(
+        create_compression_middleware(
+            build_compressors(
+                gzip_level=COMPRESSION_GZIP_LEVEL,
+                brotli_quality=COMPRESSION_BROTLI_QUALITY,
+                zstd_level=COMPRESSION_ZSTD_LEVEL,
+            ),
+            min_size=COMPRESSION_MIN_SIZE,
+            executor_min_size=COMPRESSION_EXECUTOR_MIN_SIZE,
+            cache=app["compressed_body_cache"],
+        )
+    )
     app.middlewares.append(validation_middleware)
     app.middlewares.append(auth_middleware)
     setup_aiohttp_apispec(app=app)
@@ -1,11 +1,24 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, func, text, or_, and_, tuple_
 from sqlalchemy.orm import sessionmaker, selectinload
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from src.database.models import Base
+from src.database.models import (
+    Base,
+    Debate,
+    DebateLog,
+    User,
+    ChatMessage,
+    IdempotencyKey,
+    Job,
+)
+from src.database.query_log import install_query_logging
+import asyncio
 import logging
 import os
+import time
 import dotenv
 
 logger = logging.getLogger(__name__)
@@ -18,10 +31,90 @@ DATABASE_PASSWORD = os.environ.get("DATABASE_PASSWORD", "password")
 DATABASE_NAME = os.environ.get("DATABASE_NAME", "dbname")
 DATABASE_URL = f"postgresql+asyncpg://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+DATABASE_POOL_PRE_PING = (
+    os.environ.get("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+)
+DATABASE_STATEMENT_CACHE_SIZE = int(
+    os.environ.get("DATABASE_STATEMENT_CACHE_SIZE", 100)
+)
+DATABASE_POOL_WARMUP = int(os.environ.get("DATABASE_POOL_WARMUP", DATABASE_POOL_SIZE))
+
+
+class VersionConflict(Exception):
+    """Raised when a debate was changed by someone else since it was read."""
+
+
+pool_wait_stats = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            pool_wait_stats["count"] += 1
+            pool_wait_stats["total_seconds"] += waited
+            pool_wait_stats["max_seconds"] = max(pool_wait_stats["max_seconds"], waited)
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=DATABASE_POOL_SIZE,
+    max_overflow=DATABASE_MAX_OVERFLOW,
+    pool_timeout=DATABASE_POOL_TIMEOUT,
+    pool_recycle=DATABASE_POOL_RECYCLE,
+    pool_pre_ping=DATABASE_POOL_PRE_PING,
+    connect_args={"prepared_statement_cache_size": DATABASE_STATEMENT_CACHE_SIZE},
+)
+install_query_logging(engine)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def get_pool_metrics() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "wait_count": pool_wait_stats["count"],
+        "wait_seconds_total": pool_wait_stats["total_seconds"],
+        "wait_seconds_max": pool_wait_stats["max_seconds"],
+    }
+
+
+async def warm_up_pool(connections: int = DATABASE_POOL_WARMUP):
+    """
+    Opens up to `connections` pooled connections at once and returns them to the
+    pool, so the first requests after a deploy skip connection setup.
+    """
+    connections = min(connections, DATABASE_POOL_SIZE)
+
+    async def open_connection():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    results = await asyncio.gather(
+        *(open_connection() for _ in range(connections)), return_exceptions=True
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        logger.warning(
+            f"Database pool warm-up opened {connections - len(failures)}/{connections} connections: {failures[0]}"
+        )
+    else:
+        logger.info(f"Database pool warmed up with {connections} connections.")
+
+
 async def get_db_session() -> AsyncSession:
     async with async_session() as session:
         yield session
@@ -124,6 +217,35 @@ async def get_items_by_filters(
         return []
 
 
+async def get_user_debate_page(
+    session: AsyncSession,
+    user_id: int,
+    columns: list[str],
+    limit: int,
+    after: tuple = None,
+) -> list:
+    """
+    Returns up to `limit` of a user's debates, newest first, as mappings of
+    only the requested `columns` plus created_at and id. `after` is the
+    (created_at, id) of the last debate of the previous page; comparing it as a
+    row value lets the (user_id, created_at, id) index seek straight to the
+    page instead of counting past an OFFSET.
+    """
+    selected = dict.fromkeys([*columns, "created_at", "id"])
+    stmt = select(*(getattr(Debate, column) for column in selected)).where(
+        Debate.user_id == user_id
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Debate.created_at, Debate.id) < tuple_(*after))
+    stmt = stmt.order_by(Debate.created_at.desc(), Debate.id.desc()).limit(limit)
+    try:
+        result = await session.execute(stmt)
+        return result.mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting debates page for User {user_id}: {e}")
+        return []
+
+
 async def update_item(
     session: AsyncSession, item_id: int, update_data: dict, model_class
 ):
@@ -155,6 +277,388 @@ async def update_item(
         return None
 
 
+async def get_chat_messages(
+    session: AsyncSession,
+    debate_id: int,
+    side: str,
+    from_seq: int = 0,
+    to_seq: int = None,
+) -> list:
+    try:
+        stmt = select(ChatMessage).where(
+            ChatMessage.debate_id == debate_id,
+            ChatMessage.side == side,
+            ChatMessage.seq >= from_seq,
+        )
+        if to_seq is not None:
+            stmt = stmt.where(ChatMessage.seq < to_seq)
+        result = await session.execute(stmt.order_by(ChatMessage.seq))
+        return result.scalars().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting {side} chat messages for Debate {debate_id}: {e}")
+        return []
+
+
+async def get_debate_log_entries(
+    session: AsyncSession, debate_id: int, from_seq: int = 0
+) -> list:
+    try:
+        result = await session.execute(
+            select(DebateLog)
+            .where(DebateLog.debate_id == debate_id, DebateLog.seq >= from_seq)
+            .order_by(DebateLog.seq)
+        )
+        return result.scalars().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting log entries for Debate {debate_id}: {e}")
+        return []
+
+
+async def update_history_summary(
+    session: AsyncSession,
+    debate_id: int,
+    side: str,
+    summary: str,
+    previous_through: int,
+    summarized_through: int,
+) -> bool:
+    """
+    Stores a new rolling summary for one side, only if nobody else advanced the
+    summary since `previous_through` was read.
+    """
+    through_column = getattr(Debate, f"{side}_summarized_through")
+    try:
+        result = await session.execute(
+            update(Debate)
+            .where(Debate.id == debate_id, through_column == previous_through)
+            .values(
+                **{
+                    f"{side}_history_summary": summary,
+                    f"{side}_summarized_through": summarized_through,
+                }
+            )
+        )
+        await session.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error updating {side} summary for Debate {debate_id}: {e}")
+        return False
+
+
+async def append_debate_entries(
+    session: AsyncSession,
+    debate_id: int,
+    entries: list,
+    update_data: dict = None,
+    expected_version: int = None,
+) -> bool:
+    """
+    Inserts new DebateLog/ChatMessage rows for a debate, optionally updating
+    small Debate columns in the same transaction. Existing rows are never
+    rewritten, so the cost of a turn does not grow with the debate's length.
+
+    With `expected_version` the debate's version is compared and bumped in the
+    same UPDATE, and VersionConflict is raised (with nothing written) if the
+    debate moved on since it was read.
+    """
+    try:
+        session.add_all(entries)
+        values = dict(update_data or {})
+        stmt = update(Debate).where(Debate.id == debate_id)
+        if expected_version is not None:
+            stmt = stmt.where(Debate.version == expected_version)
+            values["version"] = expected_version + 1
+        if values:
+            result = await session.execute(stmt.values(**values))
+            if expected_version is not None and result.rowcount != 1:
+                await session.rollback()
+                raise VersionConflict(
+                    f"Debate {debate_id} is no longer at version {expected_version}."
+                )
+        await session.commit()
+        return True
+    except IntegrityError as e:
+        # Log rows share (debate_id, seq) keys, so a concurrent append of the
+        # same turn lands here.
+        await session.rollback()
+        raise VersionConflict(f"Debate {debate_id} was appended to concurrently: {e}")
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error appending entries to Debate with ID {debate_id}: {e}")
+        return False
+    except VersionConflict:
+        raise
+    except Exception as e:
+        await session.rollback()
+        logger.error(
+            f"Unexpected error appending entries to Debate with ID {debate_id}: {e}"
+        )
+        return False
+
+
+async def get_or_create_user_id(session: AsyncSession, auth_id: str):
+    """
+    Returns the id of the user with `auth_id`, creating the user if needed, in a
+    single round trip: the INSERT ... ON CONFLICT DO NOTHING RETURNING runs as a
+    CTE alongside a lookup of the existing row, so concurrent first requests for
+    the same user cannot fail on the unique constraint.
+    """
+    inserted = (
+        pg_insert(User)
+        .values(auth_id=auth_id)
+        .on_conflict_do_nothing(index_elements=[User.auth_id])
+        .returning(User.id)
+        .cte("inserted")
+    )
+    stmt = (
+        select(inserted.c.id)
+        .union_all(select(User.id).where(User.auth_id == auth_id))
+        .limit(1)
+    )
+    try:
+        # A row inserted by a concurrent transaction after our snapshot is
+        # invisible to both branches, so try once more if nothing came back.
+        for _ in range(2):
+            user_id = (await session.execute(stmt)).scalar_one_or_none()
+            await session.commit()
+            if user_id is not None:
+                return user_id
+        return None
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error getting or creating User for {auth_id}: {e}")
+        return None
+
+
+def seconds_from_now(seconds: float):
+    return func.now() + func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+async def claim_idempotency_key(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    request_hash: str,
+    ttl: float,
+):
+    """
+    Claims `key` for a new request unless an unexpired claim exists. Returns
+    (True, None) when claimed, or (False, existing IdempotencyKey) otherwise,
+    in one round trip. Expired rows are taken over in place. Returns
+    (False, None) on database errors.
+    """
+    expires_at = seconds_from_now(ttl)
+    claim = (
+        pg_insert(IdempotencyKey)
+        .values(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            expires_at=expires_at,
+        )
+        .on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_={
+                "request_hash": request_hash,
+                "status_code": None,
+                "response_body": None,
+                "expires_at": expires_at,
+            },
+            where=IdempotencyKey.expires_at <= func.now(),
+        )
+        .returning(IdempotencyKey.key)
+    )
+    try:
+        claimed = (await session.execute(claim)).scalar_one_or_none() is not None
+        existing = None
+        if not claimed:
+            existing = await session.get(IdempotencyKey, (user_id, key))
+        await session.commit()
+        return claimed, existing
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error claiming idempotency key for User {user_id}: {e}")
+        return False, None
+
+
+async def complete_idempotency_key(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    status_code: int,
+    response_body: str,
+    ttl: float,
+) -> bool:
+    try:
+        await session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(
+                status_code=status_code,
+                response_body=response_body,
+                expires_at=seconds_from_now(ttl),
+            )
+        )
+        await session.commit()
+        return True
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error storing idempotent response for User {user_id}: {e}")
+        return False
+
+
+async def release_idempotency_key(
+    session: AsyncSession, user_id: int, key: str
+) -> bool:
+    """Drops an unfinished claim so the request can be retried."""
+    try:
+        await session.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+            )
+        )
+        await session.commit()
+        return True
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error releasing idempotency key for User {user_id}: {e}")
+        return False
+
+
+async def delete_expired_idempotency_keys(session: AsyncSession) -> int:
+    try:
+        result = await session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now())
+        )
+        await session.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error deleting expired idempotency keys: {e}")
+        return 0
+
+
+async def claim_job(session: AsyncSession, lease_seconds: float):
+    """
+    Marks the oldest runnable job as running under a lease and returns it, or
+    None. Runnable means queued and due, or running with an expired lease (its
+    worker died) and attempts left; abandoned jobs without attempts left are
+    marked failed instead. SKIP LOCKED lets any number of workers, in any
+    number of processes, claim jobs concurrently without handing one out twice.
+    """
+    abandoned = and_(Job.status == "running", Job.lease_expires_at <= func.now())
+    exhausted_jobs = (
+        select(Job.id)
+        .where(abandoned, Job.attempts >= Job.max_attempts)
+        .with_for_update(skip_locked=True)
+    )
+    fail_exhausted = (
+        update(Job)
+        .where(Job.id.in_(exhausted_jobs))
+        .values(
+            status="failed",
+            error="Lease expired during the last attempt",
+            lease_expires_at=None,
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    next_job = (
+        select(Job.id)
+        .where(
+            or_(
+                and_(Job.status == "queued", Job.run_after <= func.now()),
+                and_(abandoned, Job.attempts < Job.max_attempts),
+            )
+        )
+        .order_by(Job.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id == next_job)
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            lease_expires_at=seconds_from_now(lease_seconds),
+            updated_at=func.now(),
+        )
+        .returning(Job)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        failed = (await session.execute(fail_exhausted)).rowcount
+        if failed:
+            logger.warning(f"Failed {failed} abandoned Jobs with no attempts left.")
+        job = (await session.execute(stmt)).scalars().first()
+        await session.commit()
+        return job
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error claiming Job: {e}")
+        return None
+
+
+async def renew_job_lease(
+    session: AsyncSession, job_id: int, attempt: int, lease_seconds: float
+) -> bool:
+    """
+    Extends a running job's lease, only if `attempt` still holds it, i.e. the
+    job was not reclaimed by another worker in the meantime.
+    """
+    try:
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running", Job.attempts == attempt)
+            .values(
+                lease_expires_at=seconds_from_now(lease_seconds),
+                updated_at=func.now(),
+            )
+        )
+        await session.commit()
+        return result.rowcount == 1
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error renewing lease of Job with ID {job_id}: {e}")
+        return False
+
+
+async def finish_job(
+    session: AsyncSession,
+    job_id: int,
+    status: str,
+    result: dict = None,
+    error: str = None,
+    retry_in: float = None,
+) -> bool:
+    """
+    Records the outcome of a job attempt. `retry_in` puts the job back in the
+    queue to run again after that many seconds.
+    """
+    values = {
+        "status": status,
+        "result": result,
+        "error": error,
+        "lease_expires_at": None,
+        "updated_at": func.now(),
+    }
+    if retry_in is not None:
+        values["run_after"] = seconds_from_now(retry_in)
+    try:
+        await session.execute(update(Job).where(Job.id == job_id).values(**values))
+        await session.commit()
+        return True
+    except SQLAlchemyError as e:
+        await session.rollback()
+        logger.error(f"Error finishing Job with ID {job_id}: {e}")
+        return False
+
+
 async def create_all_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
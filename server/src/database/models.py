@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    ForeignKey,
+    JSON,
+    DateTime,
+    Index,
+    func,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 
@@ -11,11 +21,18 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     auth_id = Column(String, unique=True, nullable=False)
     name = Column(String)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
     debates = relationship("Debate", back_populates="user")
 
 
 class Debate(Base):
     __tablename__ = "debate"
+    # Serves keyset pagination of a user's debates, newest first.
+    __table_args__ = (
+        Index("ix_debate_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("user.id"))
@@ -25,9 +42,106 @@ class Debate(Base):
     questions = Column(JSON, default=list)
 
     current_turn = Column(String, nullable=False, default="pro")
-    logs = Column(JSON, default=list)
-
-    pro_chat_history = Column(JSON, default=list)
-    con_chat_history = Column(JSON, default=list)
+    log_entries = relationship(
+        "DebateLog", back_populates="debate", order_by="DebateLog.seq"
+    )
+    chat_messages = relationship(
+        "ChatMessage", back_populates="debate", order_by="ChatMessage.seq"
+    )
+    # Chat messages before *_summarized_through are folded into *_history_summary.
+    pro_history_summary = Column(Text, nullable=True)
+    con_history_summary = Column(Text, nullable=True)
+    pro_summarized_through = Column(Integer, nullable=False, default=0)
+    con_summarized_through = Column(Integer, nullable=False, default=0)
 
     winner = Column(String, nullable=True)
+    # Bumped by every turn so concurrent writers can detect each other.
+    version = Column(Integer, nullable=False, default=1)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+    @property
+    def logs(self) -> list[dict]:
+        return [entry.to_dict() for entry in self.log_entries]
+
+    def history_summary(self, side: str) -> str:
+        return getattr(self, f"{side}_history_summary")
+
+    def summarized_through(self, side: str) -> int:
+        return getattr(self, f"{side}_summarized_through") or 0
+
+
+class DebateLog(Base):
+    __tablename__ = "debate_log"
+
+    debate_id = Column(Integer, ForeignKey("debate.id"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    debate = relationship("Debate", back_populates="log_entries")
+
+    speaker = Column(String, nullable=False)
+    response_type = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "speaker": self.speaker,
+            "response_type": self.response_type,
+            "text": self.text,
+        }
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_message"
+
+    debate_id = Column(Integer, ForeignKey("debate.id"), primary_key=True)
+    side = Column(String, primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    debate = relationship("Debate", back_populates="chat_messages")
+
+    content = Column(JSON, nullable=False)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # Both stay NULL while the original request is still running.
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class Job(Base):
+    __tablename__ = "job"
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    debate_id = Column(Integer, ForeignKey("debate.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed; retries go back to queued.
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    run_after = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # A running job whose lease has expired was abandoned and can be reclaimed.
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
@@ -0,0 +1,116 @@
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import Optional
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_MODES = ("off", "sampled", "slow")
+
+QUERY_LOG_MODE = os.environ.get("DATABASE_QUERY_LOG", "slow").lower()
+QUERY_LOG_SAMPLE_RATE = float(os.environ.get("DATABASE_QUERY_LOG_SAMPLE_RATE", 0.01))
+SLOW_QUERY_MS = float(os.environ.get("DATABASE_SLOW_QUERY_MS", 200))
+MAX_PARAM_LENGTH = int(os.environ.get("DATABASE_QUERY_LOG_MAX_PARAM_LENGTH", 64))
+MAX_STATEMENT_LENGTH = 500
+
+
+class DatabaseTimer:
+    """Running total of the statements executed on behalf of one request."""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set per request by the metrics middleware; statements run outside a request
+# (job workers, startup) are not attributed to anything.
+database_timer: ContextVar[Optional[DatabaseTimer]] = ContextVar(
+    "database_timer", default=None
+)
+
+
+def truncate(value, limit: int) -> str:
+    text = repr(value) if not isinstance(value, str) else value
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...<{len(text)} chars>"
+
+
+def summarize_parameters(parameters, limit: int = MAX_PARAM_LENGTH):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: truncate(value, limit) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        # executemany passes a sequence of parameter sets; only keep the first.
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return {
+                "first": summarize_parameters(parameters[0], limit),
+                "count": len(parameters),
+            }
+        return [truncate(value, limit) for value in parameters]
+    return truncate(parameters, limit)
+
+
+def should_log(duration_ms: float) -> bool:
+    if QUERY_LOG_MODE == "slow":
+        return duration_ms >= SLOW_QUERY_MS
+    if QUERY_LOG_MODE == "sampled":
+        return duration_ms >= SLOW_QUERY_MS or random.random() < QUERY_LOG_SAMPLE_RATE
+    return False
+
+
+def install_query_logging(engine: AsyncEngine):
+    """
+    Replaces SQLAlchemy's echo with per-statement timing. Every statement is
+    timed and added to the current request's DatabaseTimer, but only slow or
+    sampled statements are logged, as one JSON record with the statement and
+    parameters truncated.
+    """
+    if QUERY_LOG_MODE not in QUERY_LOG_MODES:
+        logger.warning(
+            f"Unknown DATABASE_QUERY_LOG mode '{QUERY_LOG_MODE}', "
+            f"expected one of {QUERY_LOG_MODES}."
+        )
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        duration = time.perf_counter() - started
+        timer = database_timer.get()
+        if timer is not None:
+            timer.statements += 1
+            timer.seconds += duration
+        duration_ms = duration * 1000
+        if not should_log(duration_ms):
+            return
+        record = {
+            "event": "sql_query",
+            "duration_ms": round(duration_ms, 2),
+            "slow": duration_ms >= SLOW_QUERY_MS,
+            "statement": truncate(" ".join(statement.split()), MAX_STATEMENT_LENGTH),
+            "parameters": summarize_parameters(parameters),
+            "executemany": executemany,
+            "rowcount": cursor.rowcount,
+        }
+        level = logging.WARNING if record["slow"] else logging.INFO
+        logger.log(level, json.dumps(record, default=str))
@@ -0,0 +1,188 @@
+"""
+Query-plan check for the hot database paths.
+
+Runs each helper the request handlers use against a real database inside a
+transaction that is rolled back, captures every statement it sends, and asks
+Postgres to EXPLAIN them with sequential scans discouraged. Any statement that
+still plans a Seq Scan on one of HOT_TABLES has no usable index and is reported.
+
+    python -m src.database.query_plans
+
+Exits with status 1 if any hot-path statement scans a whole table.
+"""
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+import logging
+import sys
+
+from src.database.database import (
+    engine,
+    create_item,
+    get_item_by_id,
+    get_all_items,
+    get_items_by_filters,
+    update_item,
+    get_debate_log_entries,
+    get_user_debate_page,
+    get_chat_messages,
+    update_history_summary,
+    append_debate_entries,
+    get_or_create_user_id,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+    delete_expired_idempotency_keys,
+    claim_job,
+    renew_job_lease,
+    finish_job,
+)
+import src.database.models as db_models
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLES = {"user", "debate", "debate_log", "chat_message", "idempotency_key", "job"}
+EXPLAINED_VERBS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+async def run_hot_paths(session: AsyncSession):
+    """Exercises the helpers behind every request handler and job worker."""
+    user_id = await get_or_create_user_id(session, "query-plan-check")
+    debate = await create_item(
+        session,
+        {
+            "user_id": user_id,
+            "topic": "Query plans",
+            "log_entries": [
+                db_models.DebateLog(
+                    seq=0, speaker="moderator", response_type="opening", text="..."
+                )
+            ],
+        },
+        db_models.Debate,
+    )
+    debate = await get_item_by_id(session, debate.id, db_models.Debate, ["log_entries"])
+    await append_debate_entries(
+        session,
+        debate.id,
+        [
+            db_models.DebateLog(
+                debate_id=debate.id,
+                seq=1,
+                speaker="pro",
+                response_type="argument",
+                text="...",
+            ),
+            db_models.ChatMessage(
+                debate_id=debate.id, side="pro", seq=0, content={"role": "user"}
+            ),
+        ],
+        {"current_turn": "con"},
+        expected_version=debate.version,
+    )
+    await get_chat_messages(session, debate.id, "pro", 0, 1)
+    await update_history_summary(session, debate.id, "pro", "...", 0, 1)
+    await get_debate_log_entries(session, debate.id)
+    await get_debate_log_entries(session, debate.id, 1)
+    await update_item(session, debate.id, {"winner": "pro"}, db_models.Debate)
+    await get_items_by_filters(session, db_models.Debate, user_id=user_id)
+    await get_all_items(session, db_models.Debate, load_relationships=["log_entries"])
+
+    await get_user_debate_page(session, user_id, ["topic", "winner"], 21)
+    await get_user_debate_page(
+        session,
+        user_id,
+        ["topic", "winner"],
+        21,
+        after=(datetime.now(timezone.utc) + timedelta(days=1), 0),
+    )
+
+    await claim_idempotency_key(session, user_id, "plan-a", "hash", 300)
+    await complete_idempotency_key(session, user_id, "plan-a", 200, "{}", 300)
+    await claim_idempotency_key(session, user_id, "plan-a", "hash", 300)
+    await claim_idempotency_key(session, user_id, "plan-b", "hash", 300)
+    await release_idempotency_key(session, user_id, "plan-b")
+    await delete_expired_idempotency_keys(session)
+
+    job = await create_item(
+        session,
+        {"user_id": user_id, "debate_id": debate.id, "kind": "judge"},
+        db_models.Job,
+    )
+    await claim_job(session, 300)
+    await renew_job_lease(session, job.id, 1, 300)
+    await finish_job(session, job.id, "queued", error="retry", retry_in=0)
+    await finish_job(session, job.id, "succeeded", result={})
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def seq_scans(plan: dict) -> list[str]:
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in HOT_TABLES
+    ]
+
+
+async def check_query_plans() -> list[tuple[str, list[str]]]:
+    """Returns (statement, scanned tables) for every hot-path seq scan."""
+    statements = []
+    violations = []
+    async with engine.connect() as conn:
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(EXPLAINED_VERBS):
+                statements.append((statement, parameters))
+
+        event.listen(conn.sync_connection, "before_cursor_execute", capture)
+        transaction = await conn.begin()
+        try:
+            # Helpers commit as they go; savepoints keep it all rolled back.
+            async with AsyncSession(
+                bind=conn, join_transaction_mode="create_savepoint"
+            ) as session:
+                await run_hot_paths(session)
+            event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )
+                plan = result.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scanned = seq_scans(plan[0]["Plan"])
+                if scanned:
+                    violations.append((" ".join(statement.split()), scanned))
+        finally:
+            await transaction.rollback()
+    logger.info(f"Checked query plans for {len(statements)} statements.")
+    return violations
+
+
+async def main() -> int:
+    try:
+        violations = await check_query_plans()
+    finally:
+        await engine.dispose()
+    for statement, scanned in violations:
+        logger.error(f"Seq Scan on {', '.join(scanned)}: {statement}")
+    if violations:
+        logger.error(f"{len(violations)} hot-path statements scan whole tables.")
+        return 1
+    logger.info("No sequential scans on hot tables.")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
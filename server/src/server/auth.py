@@ -1,13 +1,17 @@
 import jwt
 import aiohttp
+from jose import jwk
+from jose import jwt as jose_jwt  # python-jose is often simpler for Auth0 JWKS
 import json
 import os
 from aiohttp import web
 import logging
 import re
-from src.database.database import async_session, get_items_by_filters, create_item
-import src.database.models as db_models
-
+from src.database.database import async_session, get_or_create_user_id
+from src.server.jwks import JWKSCache, http_jwks_fetcher
+from src.server.token_cache import VerifiedTokenCache
+from src.server.user_cache import UserIdCache, create_shared_backend
+from src.server.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +19,18 @@ AUTH0_DOMAIN = os.environ.get("AUTH0_DOMAIN")
 API_AUDIENCE = os.environ.get("AUTH0_API_AUDIENCE")
 ALGORITHMS = ["RS256"]
 
-jwks_cache = None
+JWKS_CACHE_TTL = float(os.environ.get("JWKS_CACHE_TTL", 600))
+JWKS_REFRESH_AHEAD = float(os.environ.get("JWKS_REFRESH_AHEAD", 60))
+JWKS_MIN_REFETCH_INTERVAL = float(os.environ.get("JWKS_MIN_REFETCH_INTERVAL", 30))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_MAX_AGE = float(os.environ.get("TOKEN_CACHE_MAX_AGE", 300))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 3600))
+USER_CACHE_REDIS_URL = os.environ.get("USER_CACHE_REDIS_URL")
 
 
 # AI Generated Code
-async def get_jwks():
-    global jwks_cache
-    if jwks_cache:
-        return jwks_cache
-
+async def fetch_jwks() -> dict:
     if not AUTH0_DOMAIN:
         logger.error("AUTH0_DOMAIN not set for JWKS fetching.")
         raise web.HTTPInternalServerError(
@@ -33,13 +40,7 @@ async def get_jwks():
 
     jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(jwks_url) as resp:
-                resp.raise_for_status()
-                jwks_data = await resp.json()
-                jwks_cache = jwks_data
-                logger.info("JWKS fetched and cached successfully.")
-                return jwks_data
+        return await http_jwks_fetcher(jwks_url)()
     except aiohttp.ClientError as e:
         logger.error(f"Failed to fetch JWKS: {e}")
         raise web.HTTPInternalServerError(
@@ -48,6 +49,41 @@ async def get_jwks():
         )
 
 
+def build_rsa_key(key: dict):
+    rsa_key = {
+        "kty": key["kty"],
+        "kid": key["kid"],
+        "use": key["use"],
+        "n": key["n"],
+        "e": key["e"],
+    }
+    return jwk.construct(rsa_key, algorithm=ALGORITHMS[0])
+
+
+jwks_cache = JWKSCache(
+    fetch_jwks,
+    build_key=build_rsa_key,
+    ttl=JWKS_CACHE_TTL,
+    refresh_ahead=JWKS_REFRESH_AHEAD,
+    min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+)
+
+
+verified_tokens = VerifiedTokenCache(
+    max_size=TOKEN_CACHE_SIZE, max_age=TOKEN_CACHE_MAX_AGE
+)
+
+user_ids = UserIdCache(
+    max_size=USER_CACHE_SIZE,
+    ttl=USER_CACHE_TTL,
+    shared=create_shared_backend(USER_CACHE_REDIS_URL),
+)
+
+
+async def get_jwks():
+    return await jwks_cache.get_jwks()
+
+
 class AuthError(Exception):
     def __init__(self, error, status_code):
         self.error = error
@@ -65,9 +101,13 @@ async def verify_jwt(token: str):
             500,
         )
 
+    cached_payload = verified_tokens.get(token)
+    if cached_payload is not None:
+        return cached_payload
+
     try:
-        jwks = await get_jwks()
         unverified_header = jwt.get_unverified_header(token)
+        key = await jwks_cache.get_key(unverified_header.get("kid"))
     except jwt.PyJWTError as e:
         logger.warning(f"JWT Error (unverified header): {e}")
         raise AuthError(
@@ -87,19 +127,7 @@ async def verify_jwt(token: str):
             500,
         )
 
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header.get("kid"):
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-            }
-            break  # Found the key
-
-    if not rsa_key:
+    if key is None:
         logger.warning("RSA key not found in JWKS for the given KID.")
         raise AuthError(
             {"code": "invalid_header", "description": "Unable to find appropriate key"},
@@ -107,15 +135,14 @@ async def verify_jwt(token: str):
         )
 
     try:
-        from jose import jwt as jose_jwt  # python-jose is often simpler for Auth0 JWKS
-
         payload = jose_jwt.decode(
             token,
-            rsa_key,
+            key,
             algorithms=ALGORITHMS,
             audience=API_AUDIENCE,
             issuer=f"https://{AUTH0_DOMAIN}/",
         )
+        verified_tokens.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:  # jose.exceptions.ExpiredSignatureError
         logger.warning("Token is expired.")
@@ -151,6 +178,7 @@ async def auth_middleware(request: web.Request, handler):
     public_paths = [
         re.compile(r"^/api/docs(/.*)?$"),
         re.compile(r"^/static(/.*)?$"),
+        re.compile(r"^/metrics$"),
     ]
 
     # Allow OPTIONS requests to pass through for CORS preflight
@@ -189,9 +217,10 @@ async def auth_middleware(request: web.Request, handler):
 
     token = parts[1]
     try:
-        payload = await verify_jwt(token)
-        user_id = payload.get("sub")
-        if not user_id:
+        with span("auth.verify_jwt"):
+            payload = await verify_jwt(token)
+        auth_id = payload.get("sub")
+        if not auth_id:
             logger.warning(f"Token payload missing 'sub' for {request.path}")
             return web.json_response(
                 {
@@ -200,22 +229,17 @@ async def auth_middleware(request: web.Request, handler):
                 },
                 status=401,
             )
-        # check if user exists in the database
-        async with async_session() as session:
-            filters = {"auth_id": user_id}
-            users: list[db_models.User] = await get_items_by_filters(
-                session,
-                db_models.User,
-                **filters,
-            )
-            if not users:
-                # create a new user if not exists
-                user: db_models.User = await create_item(
-                    session, {"auth_id": user_id}, db_models.User
-                )
-                if not user:
+        with span("auth.user_lookup") as lookup:
+            user_id = await user_ids.get(auth_id)
+            if lookup is not None:
+                lookup.attributes["cache.hit"] = user_id is not None
+            if user_id is None:
+                # look the user up, creating them if they do not exist yet
+                async with async_session() as session:
+                    user_id = await get_or_create_user_id(session, auth_id)
+                if user_id is None:
                     logger.error(
-                        f"Failed to create user for {user_id} in {request.path}"
+                        f"Failed to create user for {auth_id} in {request.path}"
                     )
                     return web.json_response(
                         {
@@ -224,10 +248,9 @@ async def auth_middleware(request: web.Request, handler):
                         },
                         status=500,
                     )
-            else:
-                user = users[0]
+                await user_ids.set(auth_id, user_id)
         request["user"] = payload
-        request["user_id"] = user.id
+        request["user_id"] = user_id
         logger.info(f"User {payload.get('sub')} authenticated for {request.path}")
         return await handler(request)
     except AuthError as e:
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from google.genai import errors as genai_errors
+from .scheduler import ModelScheduler, Priority, scheduled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ModelCallPolicy:
+    """
+    Deadline, retry and hedging policy for a single logical model call.
+
+    The whole call, scheduler queueing, retries and backoff included, must
+    finish within `timeout` seconds; each attempt only gets what is left of it.
+    Timeouts, transport errors and retryable API statuses are retried up to
+    `max_retries` times with exponential backoff and full jitter, as long as
+    the backoff leaves time for another attempt. With `hedge`
+    on, an attempt still running after the `hedge_quantile` latency of recent
+    calls gets a duplicate sent alongside it, and whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.5,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies: deque[float] = deque(maxlen=latency_window)
+        self.clock = clock
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        return quantile(list(self.latencies), q) if self.latencies else None
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return max(self.latency_quantile(self.hedge_quantile), self.hedge_min_delay)
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.backoff_base * 2**retry, self.backoff_max))
+
+    async def attempt(
+        self,
+        request: Callable[[], Awaitable[T]],
+        scheduler: Optional[ModelScheduler],
+        priority: Priority,
+        deadline: float,
+    ) -> T:
+        try:
+            # Time spent queueing for a slot counts against the deadline too.
+            async with scheduled(scheduler, priority, deadline - self.clock()):
+                self.attempts += 1
+                started = self.clock()
+                if deadline <= started:
+                    raise asyncio.TimeoutError()
+                result = await asyncio.wait_for(request(), deadline - started)
+                self.latencies.append(self.clock() - started)
+                return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def hedged_attempt(
+        self,
+        request: Callable[[], Awaitable[T]],
+        scheduler: Optional[ModelScheduler],
+        priority: Priority,
+        deadline: float,
+    ) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self.attempt(request, scheduler, priority, deadline)
+        first = asyncio.ensure_future(
+            self.attempt(request, scheduler, priority, deadline)
+        )
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.append(
+                    asyncio.ensure_future(
+                        self.attempt(request, scheduler, priority, deadline)
+                    )
+                )
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Every attempt failed; report the original one's error.
+            raise first.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        scheduler: Optional[ModelScheduler] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        hedge: bool = True,
+        can_retry: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Runs `request` (a factory for one attempt) under the policy. Pass
+        `hedge=False` for requests that must not run twice at once, and
+        `can_retry` to veto retries, e.g. once a stream has produced output.
+        """
+        run = self.hedged_attempt if hedge else self.attempt
+        deadline = self.clock() + self.timeout
+        for retry in range(self.max_retries + 1):
+            try:
+                return await run(request, scheduler, priority, deadline)
+            except Exception as e:
+                delay = self.backoff(retry)
+                out_of_retries = retry == self.max_retries
+                out_of_time = self.clock() + delay >= deadline
+                if (
+                    out_of_retries
+                    or out_of_time
+                    or not is_retryable(e)
+                    or not can_retry()
+                ):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.warning(
+                    f"Model call failed ({type(e).__name__}: {e}), "
+                    f"retry {retry + 1} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
@@ -0,0 +1,181 @@
+import asyncio
+import gzip
+import logging
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/")
+
+
+def build_compressors(
+    gzip_level: int = 6, brotli_quality: int = 5, zstd_level: int = 3
+) -> dict[str, Callable[[bytes], bytes]]:
+    """
+    Encodings this process can produce, in order of preference when the client
+    rates them equally. brotli and zstd are used only when installed.
+    """
+    compressors = {}
+    if zstandard is not None:
+        compressors["zstd"] = lambda body: zstandard.ZstdCompressor(
+            level=zstd_level
+        ).compress(body)
+    if brotli is not None:
+        compressors["br"] = lambda body: brotli.compress(body, quality=brotli_quality)
+    compressors["gzip"] = lambda body: gzip.compress(body, compresslevel=gzip_level)
+    return compressors
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    weights = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def negotiate_encoding(header: str, available: list[str]) -> Optional[str]:
+    """Picks the client's highest rated available encoding, or None."""
+    weights = parse_accept_encoding(header)
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # Strong ETags must differ between encodings of the same resource.
+    return f"{etag}-{encoding}"
+
+
+def strip_encoding(etag: str, encodings=("zstd", "br", "gzip")) -> str:
+    for encoding in encodings:
+        if etag.endswith(f"-{encoding}"):
+            return etag[: -len(encoding) - 1]
+    return etag
+
+
+class CompressedBodyCache:
+    """
+    LRU of compressed bodies keyed by (ETag, encoding), bounded by total size.
+    Only for responses whose ETag pins their content for good.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        body = self.entries.get((etag, encoding))
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end((etag, encoding))
+        self.hits += 1
+        return body
+
+    def set(self, etag: str, encoding: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        previous = self.entries.pop((etag, encoding), None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[(etag, encoding)] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+def is_compressible(response: web.StreamResponse) -> bool:
+    return (
+        isinstance(response, web.Response)
+        and not response.prepared
+        and response.status == 200
+        and isinstance(response.body, bytes)
+        and "Content-Encoding" not in response.headers
+        and response.content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+    )
+
+
+def create_compression_middleware(
+    compressors: dict[str, Callable[[bytes], bytes]],
+    min_size: int = 1024,
+    executor_min_size: int = 64 * 1024,
+    cache: Optional[CompressedBodyCache] = None,
+):
+    """
+    Compresses JSON and text responses of at least `min_size` bytes with the
+    best encoding the client accepts. Bodies of `executor_min_size` bytes or
+    more are compressed in a worker thread so they do not stall the loop.
+    Views mark a response as immutable by setting request["immutable"], and
+    its compressed bodies are then cached by ETag.
+    """
+    available = list(compressors)
+
+    async def compress(encoding: str, body: bytes) -> bytes:
+        if len(body) >= executor_min_size:
+            return await asyncio.to_thread(compressors[encoding], body)
+        return compressors[encoding](body)
+
+    @web.middleware
+    async def compression_middleware(request: web.Request, handler):
+        response = await handler(request)
+        if not is_compressible(response):
+            return response
+        response.headers.add("Vary", "Accept-Encoding")
+        body = response.body
+        if len(body) < min_size:
+            return response
+        encoding = negotiate_encoding(
+            request.headers.get("Accept-Encoding", ""), available
+        )
+        if encoding is None:
+            return response
+
+        etag = response.etag.value if response.etag is not None else None
+        cacheable = cache is not None and etag is not None and request.get("immutable")
+        compressed = cache.get(etag, encoding) if cacheable else None
+        if compressed is None:
+            compressed = await compress(encoding, body)
+            if cacheable:
+                cache.set(etag, encoding, compressed)
+        if len(compressed) >= len(body):
+            return response
+
+        response.body = compressed
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None:
+            response.etag = encoded_etag(etag, encoding)
+        return response
+
+    return compression_middleware
@@ -0,0 +1,652 @@
+from aiohttp import web
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable, NamedTuple
+from google.genai.chats import AsyncChats
+from .utils import (
+    start_chat,
+    send_chat_message,
+    stream_chat_message,
+    generate_text_content,
+    run_phase,
+    compact_history,
+    contents_tokens,
+    summarize_history,
+    summary_exchange,
+    window_start,
+)
+from src.database.database import (
+    async_session,
+    create_item,
+    append_debate_entries,
+    get_chat_messages,
+    update_history_summary,
+)
+from src.database.query_log import database_timer
+from .tracing import current_span, current_trace, span
+from .transcript import build_judge_transcript
+from .scheduler import Priority
+from .telemetry import phase_timer
+from .opening_pool import OpeningPair, OpeningPool
+import src.database.models as db_models
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[str, dict], Awaitable[None]]
+
+SIDES = ("pro", "con")
+
+
+class JudgmentError(Exception):
+    pass
+
+
+class SaveFailed(Exception):
+    """Raised when a turn could not be written to the database."""
+
+
+async def ignore_event(event: str, data: dict):
+    pass
+
+
+def pro_side_instructions(preamble: str, max_sentences: int) -> str:
+    return f"{preamble} You are on the pro side of a debate. Your goal is to argue for the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information."
+
+
+def con_side_instructions(preamble: str, max_sentences: int) -> str:
+    return f"{preamble} You are on the con side of a debate. Your goal is to argue against the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information."
+
+
+def send(
+    app: web.Application,
+    chat: AsyncChats,
+    speaker: str,
+    message: str,
+    emit: Emit,
+    stream_tokens: bool,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+) -> Awaitable:
+    cache = app["response_cache"] if use_cache else None
+    scheduler = app["model_scheduler"]
+    policy = app["model_call_policy"]
+    if not stream_tokens:
+        return send_chat_message(chat, message, cache, scheduler, priority, policy)
+
+    async def on_text(text: str):
+        await emit("token", {"speaker": speaker, "text": text})
+
+    return stream_chat_message(
+        chat, message, on_text, cache, scheduler, priority, policy
+    )
+
+
+async def add_log(debate_logs: list[dict], entry: dict, emit: Emit):
+    debate_logs.append(entry)
+    await emit("log", entry)
+
+
+class SideChat(NamedTuple):
+    chat: AsyncChats
+    seeded: int  # contents the chat was started with
+    next_seq: int  # seq of the next chat message stored for this side
+
+
+async def resume_chats(app: web.Application, debate: db_models.Debate):
+    """
+    Restarts both sides' chats from the rolling summary plus the whole
+    unsummarized tail of their history, which fold_history keeps bounded.
+    """
+    max_sentences = app["max_sentences"]
+    instructions = {"pro": pro_side_instructions, "con": con_side_instructions}
+    chats = {}
+    async with async_session() as session:
+        for side in SIDES:
+            through = debate.summarized_through(side)
+            messages = await get_chat_messages(session, debate.id, side, through)
+            history = compact_history(
+                [message.content for message in messages],
+                debate.history_summary(side),
+                token_budget=app["history_token_budget"],
+            )
+            chat = start_chat(
+                app["genai_client"],
+                system_instructions=instructions[side](debate.topic, max_sentences),
+                model=app["text_model_name"],
+                history=history,
+            )
+            chats[side] = SideChat(chat, len(history), through + len(messages))
+    return chats
+
+
+def log_rows(debate_logs: list[dict], first_seq: int = 0) -> list:
+    return [
+        db_models.DebateLog(seq=first_seq + offset, **entry)
+        for offset, entry in enumerate(debate_logs[first_seq:])
+    ]
+
+
+def history_rows(side: str, contents: list[dict], first_seq: int = 0) -> list:
+    return [
+        db_models.ChatMessage(side=side, seq=first_seq + offset, content=content)
+        for offset, content in enumerate(contents)
+    ]
+
+
+def chat_rows(side: str, side_chat: SideChat) -> list:
+    start = side_chat.seeded
+    history = side_chat.chat.get_history()
+    return history_rows(
+        side, [content.dict() for content in history[start:]], side_chat.next_seq
+    )
+
+
+async def save_turn(
+    debate: db_models.Debate,
+    debate_logs: list[dict],
+    chats: dict[str, SideChat] = None,
+    update_data: dict = None,
+):
+    """
+    Persists only the log entries and chat messages added since the debate was
+    loaded, along with any small column updates, in a single transaction.
+    Raises VersionConflict if the debate changed since it was loaded and
+    SaveFailed if the write itself failed.
+    """
+    entries = log_rows(debate_logs, len(debate.log_entries))
+    for side, side_chat in (chats or {}).items():
+        entries.extend(chat_rows(side, side_chat))
+    for entry in entries:
+        entry.debate_id = debate.id
+    async with async_session() as session:
+        saved = await append_debate_entries(
+            session, debate.id, entries, update_data, expected_version=debate.version
+        )
+    if not saved:
+        raise SaveFailed(f"Could not save turn for debate {debate.id}")
+    debate.version += 1
+
+
+async def fold_history(
+    app: web.Application,
+    debate: db_models.Debate,
+    side: str,
+    stored: int,
+    over_budget: bool = False,
+):
+    """
+    Folds the oldest unsummarized exchanges of one side into its rolling
+    summary, keeping only the latest `history_keep_exchanges` exchanges that
+    fit the token budget verbatim. It runs once more than twice that window
+    has built up, so the summary is regenerated every `history_keep_exchanges`
+    turns, or sooner when the history overflows the budget. Everything after
+    the folded messages is replayed by resume_chats, so none is ever lost.
+    """
+    keep = app["history_keep_exchanges"]
+    through = debate.summarized_through(side)
+    if stored - through <= 4 * keep and not over_budget:
+        return
+    async with async_session() as session:
+        messages = await get_chat_messages(session, debate.id, side, through, stored)
+    contents = [message.content for message in messages]
+    summary = debate.history_summary(side)
+    prefix = summary_exchange(summary) if summary else []
+    fold = window_start(
+        contents, app["history_token_budget"] - contents_tokens(prefix), keep
+    )
+    if fold == 0:
+        return
+    fold_until = messages[fold].seq if fold < len(messages) else messages[-1].seq + 1
+    summary = await summarize_history(
+        app["genai_client"],
+        app["text_model_name"],
+        summary,
+        contents[:fold],
+        scheduler=app["model_scheduler"],
+        policy=app["model_call_policy"],
+    )
+    async with async_session() as session:
+        await update_history_summary(
+            session, debate.id, side, summary, through, fold_until
+        )
+    logger.info(f"Folded {side} history of debate {debate.id} through {fold_until}.")
+
+
+def schedule_history_folding(
+    app: web.Application, debate: db_models.Debate, chats: dict[str, SideChat]
+):
+    for side, side_chat in chats.items():
+        history = [content.dict() for content in side_chat.chat.get_history()]
+        stored = side_chat.next_seq + len(history) - side_chat.seeded
+        over_budget = contents_tokens(history) > app["history_token_budget"]
+        spawn_background(app, fold_history(app, debate, side, stored, over_budget))
+
+
+def spawn_background(app: web.Application, coro: Awaitable) -> asyncio.Task:
+    # Work outliving the request must not count toward its database time or
+    # add spans to its trace.
+    context = contextvars.copy_context()
+    for var in (database_timer, current_trace, current_span):
+        context.run(var.set, None)
+    task = asyncio.get_running_loop().create_task(coro, context=context)
+    app["background_tasks"].add(task)
+    task.add_done_callback(finish_background_task(app))
+    return task
+
+
+def finish_background_task(app: web.Application):
+    def done(task: asyncio.Task):
+        app["background_tasks"].discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task failed: {task.exception()}")
+
+    return done
+
+
+def moderator_prompt(topic: str) -> str:
+    return f"Debate topic: {topic}. Pro side will argue in favor, Con side will argue against. I, the moderator will manage the debate."
+
+
+async def generate_openings(
+    app: web.Application,
+    topic: str,
+    emit: Emit = ignore_event,
+    stream_tokens: bool = False,
+    use_cache: bool = True,
+    priority: Priority = Priority.OPENING,
+) -> OpeningPair:
+    """
+    Runs the opening phase in two fresh chats and returns both statements with
+    the chat histories that produced them. The opening pool passes
+    `use_cache=False` so pooled pairs are independent generations, and runs at
+    background priority since nobody is waiting on them.
+    """
+    max_sentences = app["max_sentences"]
+    text_model_name = app["text_model_name"]
+    initial_prompt = moderator_prompt(topic)
+
+    pro_side_chat = start_chat(
+        app["genai_client"],
+        system_instructions=pro_side_instructions(initial_prompt, max_sentences),
+        model=text_model_name,
+    )
+    con_side_chat = start_chat(
+        app["genai_client"],
+        system_instructions=con_side_instructions(initial_prompt, max_sentences),
+        model=text_model_name,
+    )
+    opening_message = f"Opening statement for the debate topic: {topic}"
+    openings = await run_phase(
+        "opening_statement",
+        pro=send(
+            app,
+            pro_side_chat,
+            "pro",
+            opening_message,
+            emit,
+            stream_tokens,
+            use_cache,
+            priority,
+        ),
+        con=send(
+            app,
+            con_side_chat,
+            "con",
+            opening_message,
+            emit,
+            stream_tokens,
+            use_cache,
+            priority,
+        ),
+    )
+    return OpeningPair(
+        pro_text=openings["pro"],
+        con_text=openings["con"],
+        pro_history=[content.dict() for content in pro_side_chat.get_history()],
+        con_history=[content.dict() for content in con_side_chat.get_history()],
+    )
+
+
+def create_opening_pool(app: web.Application, **options) -> OpeningPool:
+    return OpeningPool(
+        generate=lambda topic: generate_openings(
+            app, topic, use_cache=False, priority=Priority.BACKGROUND
+        ),
+        spawn=lambda coro: spawn_background(app, coro),
+        **options,
+    )
+
+
+async def start_debate(
+    app: web.Application,
+    user_id: int,
+    topic: str,
+    emit: Emit = ignore_event,
+    stream_tokens: bool = False,
+) -> dict:
+    debate_logs = []
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "moderator",
+            "response_type": "opening_statement",
+            "text": moderator_prompt(topic),
+        },
+        emit,
+    )
+    pool = app["opening_pool"]
+    openings = pool.take(topic) if pool is not None else None
+    if openings is None:
+        openings = await generate_openings(app, topic, emit, stream_tokens)
+    else:
+        logger.info(f"Serving pooled opening statements for topic: {topic}")
+
+    pro_side_response = openings.pro_text
+    con_side_response = openings.con_text
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "pro",
+            "response_type": "opening_statement",
+            "text": pro_side_response,
+        },
+        emit,
+    )
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "con",
+            "response_type": "opening_statement",
+            "text": con_side_response,
+        },
+        emit,
+    )
+    async with async_session() as session:
+        debate: db_models.Debate = await create_item(
+            session,
+            {
+                "topic": topic,
+                "user_id": user_id,
+                "log_entries": log_rows(debate_logs),
+                "chat_messages": [
+                    *history_rows("pro", openings.pro_history),
+                    *history_rows("con", openings.con_history),
+                ],
+            },
+            db_models.Debate,
+        )
+
+    return {
+        "message": "Debate started",
+        "debate_id": debate.id,
+        "topic": topic,
+        "pro_initial": pro_side_response,
+        "con_initial": con_side_response,
+        "logs": debate_logs,
+    }
+
+
+async def process_turn(
+    app: web.Application,
+    debate: db_models.Debate,
+    question: str,
+    emit: Emit = ignore_event,
+    stream_tokens: bool = False,
+) -> dict:
+    max_sentences = app["max_sentences"]
+    chats = await resume_chats(app, debate)
+    pro_client_chat, con_client_chat = chats["pro"].chat, chats["con"].chat
+    debate_logs = debate.logs
+
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "moderator",
+            "response_type": "intitial_question_response",
+            "text": question,
+        },
+        emit,
+    )
+    responses = await run_phase(
+        "intitial_question_response",
+        pro=send(
+            app,
+            pro_client_chat,
+            "pro",
+            f"Respond to the question in favour of: {question}. Provide your argument in {max_sentences} sentences.",
+            emit,
+            stream_tokens,
+        ),
+        con=send(
+            app,
+            con_client_chat,
+            "con",
+            f"Respond to the question in opposition to: {question}. Provide your argument in {max_sentences} sentences.",
+            emit,
+            stream_tokens,
+        ),
+    )
+    pro_side_response = responses["pro"]
+    con_side_response = responses["con"]
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "pro",
+            "response_type": "intitial_question_response",
+            "text": pro_side_response,
+        },
+        emit,
+    )
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "con",
+            "response_type": "intitial_question_response",
+            "text": con_side_response,
+        },
+        emit,
+    )
+    # Rebuttals need both question responses, so they form a second phase.
+    rebuttals = await run_phase(
+        "rebuttal",
+        pro=send(
+            app,
+            pro_client_chat,
+            "pro",
+            f"Rebuttal to the con side's argument: {con_side_response}. Provide your rebuttal in {max_sentences} sentences.",
+            emit,
+            stream_tokens,
+        ),
+        con=send(
+            app,
+            con_client_chat,
+            "con",
+            f"Rebuttal to the pro side's argument: {pro_side_response}. Provide your rebuttal in {max_sentences} sentences.",
+            emit,
+            stream_tokens,
+        ),
+    )
+    pro_side_rebuttal = rebuttals["pro"]
+    con_side_rebuttal = rebuttals["con"]
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "pro",
+            "response_type": "rebuttal",
+            "text": pro_side_rebuttal,
+        },
+        emit,
+    )
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "con",
+            "response_type": "rebuttal",
+            "text": con_side_rebuttal,
+        },
+        emit,
+    )
+    questions = [*(debate.questions or []), question]
+    await save_turn(debate, debate_logs, chats, {"questions": questions})
+    schedule_history_folding(app, debate, chats)
+
+    return {
+        "message": "Turn processed",
+        "question": question,
+        "pro_side_response": pro_side_response,
+        "con_side_response": con_side_response,
+        "pro_side_rebuttal": pro_side_rebuttal,
+        "con_side_rebuttal": con_side_rebuttal,
+        "logs": debate_logs,
+        "questions": questions,
+    }
+
+
+async def close_debate(
+    app: web.Application,
+    debate: db_models.Debate,
+    emit: Emit = ignore_event,
+    stream_tokens: bool = False,
+) -> dict:
+    max_sentences = app["max_sentences"]
+    chats = await resume_chats(app, debate)
+    pro_client_chat, con_client_chat = chats["pro"].chat, chats["con"].chat
+    debate_logs = debate.logs
+
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "moderator",
+            "response_type": "closing_argument",
+            "text": "We will now hear the closing arguments from both sides.",
+        },
+        emit,
+    )
+    closing_message = (
+        f"Provide your closing argument for the debate in {max_sentences} sentences."
+    )
+    closings = await run_phase(
+        "closing_argument",
+        pro=send(
+            app,
+            pro_client_chat,
+            "pro",
+            closing_message,
+            emit,
+            stream_tokens,
+        ),
+        con=send(
+            app,
+            con_client_chat,
+            "con",
+            closing_message,
+            emit,
+            stream_tokens,
+        ),
+    )
+    pro_closing = closings["pro"]
+    con_closing = closings["con"]
+
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "pro",
+            "response_type": "closing_argument",
+            "text": pro_closing,
+        },
+        emit,
+    )
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "con",
+            "response_type": "closing_argument",
+            "text": con_closing,
+        },
+        emit,
+    )
+    await save_turn(debate, debate_logs, chats)
+    logger.info(
+        f"Closing arguments processed for debate ID {debate.id}: Pro: {pro_closing}, Con: {con_closing}"
+    )
+    return {
+        "message": "Closing arguments processed",
+        "pro_closing": pro_closing,
+        "con_closing": con_closing,
+        "logs": debate_logs,
+        "questions": debate.questions,
+    }
+
+
+async def judge_debate(
+    app: web.Application,
+    debate: db_models.Debate,
+    emit: Emit = ignore_event,
+) -> dict:
+    debate_logs = debate.logs
+    with span("phase.judgment"), phase_timer("judgment"):
+        transcript, _ = await build_judge_transcript(
+            app["genai_client"],
+            app["text_model_name"],
+            debate_logs,
+            token_budget=app["judge_transcript_token_budget"],
+            scheduler=app["model_scheduler"],
+            policy=app["model_call_policy"],
+        )
+        judgment_prompt = f"Based on the debate about {debate.topic}, provide a final judgment on who won the debate. Consider all arguments and rebuttals. Give one word answer: 'pro' or 'con'. Here is the transcript of the debate:\n{transcript}"
+
+        judgment = (
+            (
+                await generate_text_content(
+                    app["genai_client"],
+                    judgment_prompt,
+                    system_instructions="You are a debate judge. Analyze the debate transcript and provide a final judgment on who won the debate.",
+                    model_name=app["text_model_name"],
+                    cache=app["response_cache"],
+                    scheduler=app["model_scheduler"],
+                    priority=Priority.JUDGE,
+                    policy=app["model_call_policy"],
+                )
+            )
+            .text.strip()
+            .lower()
+        )
+
+    if judgment not in ["pro", "con"]:
+        if "pro" in judgment:
+            judgment = "pro"
+        elif "con" in judgment:
+            judgment = "con"
+        else:
+            raise JudgmentError(
+                f"Invalid judgment received from model: {judgment}. Expected 'pro' or 'con'."
+            )
+
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "moderator",
+            "response_type": "narration",
+            "text": "We will now hear the final judgment on the debate.",
+        },
+        emit,
+    )
+    await add_log(
+        debate_logs,
+        {
+            "speaker": "moderator",
+            "response_type": "judgment",
+            "text": f"Judgment: The winner is {judgment}.",
+        },
+        emit,
+    )
+    await save_turn(debate, debate_logs, update_data={"winner": judgment})
+    logger.info(f"Debate judged: {judgment}")
+    return {
+        "message": "Debate judged",
+        "judgment": judgment,
+        "logs": debate_logs,
+        "questions": debate.questions,
+        "winner": judgment,
+    }
@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class DebateLocks:
+    """
+    Per-debate asyncio locks, so turns on the same debate run one at a time in
+    this process while other debates proceed. A debate's lock is dropped once
+    nobody holds or waits for it.
+    """
+
+    def __init__(self):
+        self.locks: dict[int, asyncio.Lock] = {}
+        self.users: dict[int, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, debate_id: int):
+        lock = self.locks.setdefault(debate_id, asyncio.Lock())
+        self.users[debate_id] = self.users.get(debate_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.users[debate_id] -= 1
+            if not self.users[debate_id]:
+                del self.users[debate_id]
+                del self.locks[debate_id]
+
+    def waiting(self) -> int:
+        return sum(self.users.values()) - sum(
+            lock.locked() for lock in self.locks.values()
+        )
@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+from typing import NamedTuple, Optional
+
+from aiohttp import web
+from src.database.database import (
+    async_session,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_KEY_TTL = float(os.environ.get("IDEMPOTENCY_KEY_TTL", 86400))
+# How long another process waits before taking over an unfinished request,
+# e.g. after the worker handling it crashed.
+IDEMPOTENCY_IN_PROGRESS_TTL = float(os.environ.get("IDEMPOTENCY_IN_PROGRESS_TTL", 300))
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status: int
+    body: str
+    replayed: bool = True
+
+
+def request_fingerprint(request: web.Request) -> str:
+    payload = json.dumps(
+        {"path": request.path, "data": request.get("data")},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def replay(stored: StoredResponse, request_hash: str) -> web.Response:
+    if stored.request_hash != request_hash:
+        return web.json_response(
+            {"error": "Idempotency-Key was already used for a different request."},
+            status=422,
+        )
+    headers = {"Idempotent-Replayed": "true"} if stored.replayed else None
+    return web.Response(
+        text=stored.body,
+        status=stored.status,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def run_once(
+    handler, request: web.Request, key: str, request_hash: str
+) -> tuple[StoredResponse, Optional[web.Response]]:
+    """
+    Runs `handler` under a database claim on the key, returning the stored form
+    of its response along with the response itself. If an earlier request
+    already holds the key, returns its stored response (or a 409 while it is
+    still running elsewhere) and no handler response. Only responses below 500
+    are stored; server errors and version conflicts release the claim so a
+    retry runs again.
+    """
+    user_id = request["user_id"]
+    async with async_session() as session:
+        claimed, existing = await claim_idempotency_key(
+            session, user_id, key, request_hash, IDEMPOTENCY_IN_PROGRESS_TTL
+        )
+    if existing is not None:
+        if existing.status_code is None:
+            body = {"error": "A request with this Idempotency-Key is in progress."}
+            return StoredResponse(request_hash, 409, json.dumps(body), False), None
+        stored = StoredResponse(
+            existing.request_hash, existing.status_code, existing.response_body
+        )
+        return stored, None
+    if not claimed:
+        logger.warning("Idempotency key store unavailable, running request anyway.")
+        response = await handler(request)
+        return StoredResponse(request_hash, response.status, response.text), response
+
+    try:
+        response = await handler(request)
+    except BaseException:
+        async with async_session() as session:
+            await release_idempotency_key(session, user_id, key)
+        raise
+    async with async_session() as session:
+        if response.status < 500 and response.status != 409:
+            await complete_idempotency_key(
+                session,
+                user_id,
+                key,
+                response.status,
+                response.text,
+                IDEMPOTENCY_KEY_TTL,
+            )
+        else:
+            await release_idempotency_key(session, user_id, key)
+    return StoredResponse(request_hash, response.status, response.text), response
+
+
+def idempotent(handler):
+    """
+    Makes a JSON view safe to retry with an `Idempotency-Key` header: the first
+    request with a key runs and its response is stored for IDEMPOTENCY_KEY_TTL
+    seconds, later requests with the same key get that response back without
+    running the view. Duplicates arriving while the first one is still running
+    in this process wait for it instead of starting their own model calls.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(request: web.Request) -> web.Response:
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return await handler(request)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return web.json_response(
+                {"error": f"{IDEMPOTENCY_KEY_HEADER} is too long."}, status=400
+            )
+        request_hash = request_fingerprint(request)
+        scope = (request["user_id"], key)
+        inflight = request.app["idempotent_requests"]
+
+        while (pending := inflight.get(scope)) is not None:
+            # Never cancel the shared request because one waiter went away.
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return replay(pending.result(), request_hash)
+
+        future = asyncio.get_running_loop().create_future()
+        inflight[scope] = future
+        try:
+            stored, response = await run_once(handler, request, key, request_hash)
+            future.set_result(stored)
+        finally:
+            del inflight[scope]
+            if not future.done():
+                # The first request failed; its waiters retry it themselves.
+                future.cancel()
+        return response if response is not None else replay(stored, request_hash)
+
+    return wrapper
@@ -0,0 +1,195 @@
+from aiohttp import web
+import asyncio
+import logging
+import os
+import random
+from .debate import close_debate, judge_debate, spawn_background
+from .schemas import ClosingArgmentResponse, JudgeDebateResponse
+from .scheduler import ModelOverloaded
+from .serialization import serialize
+from src.database.database import (
+    async_session,
+    create_item,
+    get_item_by_id,
+    claim_job,
+    finish_job,
+    renew_job_lease,
+)
+import src.database.models as db_models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 2))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 300))
+JOB_RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", 2))
+JOB_RETRY_MAX_DELAY = float(os.environ.get("JOB_RETRY_MAX_DELAY", 60))
+
+
+def closing_arguments(debate: db_models.Debate) -> dict[str, str]:
+    return {
+        entry.speaker: entry.text
+        for entry in debate.log_entries
+        if entry.response_type == "closing_argument" and entry.speaker != "moderator"
+    }
+
+
+async def run_judge_job(app: web.Application, debate: db_models.Debate) -> dict:
+    # An earlier attempt may have saved its judgment and died before the job
+    # was marked succeeded; judging again would append a second one.
+    if debate.winner:
+        logger.info(f"Debate {debate.id} is already judged; reusing the judgment.")
+        result = {
+            "message": "Debate judged",
+            "judgment": debate.winner,
+            "logs": debate.logs,
+            "questions": debate.questions,
+            "winner": debate.winner,
+        }
+    else:
+        result = await judge_debate(app, debate)
+    return serialize(JudgeDebateResponse, result)
+
+
+async def run_close_job(app: web.Application, debate: db_models.Debate) -> dict:
+    closings = closing_arguments(debate)
+    if "pro" in closings and "con" in closings:
+        logger.info(f"Debate {debate.id} is already closed; reusing the closings.")
+        result = {
+            "message": "Closing arguments processed",
+            "pro_closing": closings["pro"],
+            "con_closing": closings["con"],
+            "logs": debate.logs,
+            "questions": debate.questions,
+        }
+    else:
+        result = await close_debate(app, debate)
+    return serialize(ClosingArgmentResponse, result)
+
+
+JOB_KINDS = {
+    "judge": run_judge_job,
+    "close": run_close_job,
+}
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix."""
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped at JOB_RETRY_MAX_DELAY."""
+    delay = min(JOB_RETRY_BASE_DELAY * 2 ** (attempt - 1), JOB_RETRY_MAX_DELAY)
+    return random.uniform(0, delay)
+
+
+async def enqueue_job(
+    app: web.Application, user_id: int, debate_id: int, kind: str
+) -> db_models.Job:
+    async with async_session() as session:
+        job = await create_item(
+            session,
+            {
+                "user_id": user_id,
+                "debate_id": debate_id,
+                "kind": kind,
+                "max_attempts": JOB_MAX_ATTEMPTS,
+            },
+            db_models.Job,
+        )
+    if job is not None:
+        app["job_wakeup"].set()
+        logger.info(f"Queued {kind} job {job.id} for debate {debate_id}.")
+    return job
+
+
+async def keep_lease(job: db_models.Job):
+    """
+    Renews the job's lease every third of JOB_LEASE_SECONDS until cancelled, so
+    an attempt that outlives one lease is not reclaimed by another worker.
+    """
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        async with async_session() as session:
+            renewed = await renew_job_lease(
+                session, job.id, job.attempts, JOB_LEASE_SECONDS
+            )
+        if not renewed:
+            logger.warning(f"Job {job.id} attempt {job.attempts} lost its lease.")
+            return
+
+
+async def execute_job(app: web.Application, job: db_models.Job) -> dict:
+    heartbeat = asyncio.create_task(keep_lease(job))
+    try:
+        async with app["debate_locks"].hold(job.debate_id):
+            async with async_session() as session:
+                debate: db_models.Debate = await get_item_by_id(
+                    session, job.debate_id, db_models.Debate, ["log_entries"]
+                )
+            if not debate:
+                raise PermanentJobError(f"Debate {job.debate_id} not found")
+            return await JOB_KINDS[job.kind](app, debate)
+    finally:
+        heartbeat.cancel()
+
+
+async def run_job(app: web.Application, job: db_models.Job):
+    try:
+        result = await execute_job(app, job)
+    except asyncio.CancelledError:
+        # Shutting down: hand the job straight back instead of waiting out the
+        # lease. The attempt did not finish, so it does not count.
+        async with async_session() as session:
+            await finish_job(session, job.id, "queued", retry_in=0)
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        permanent = isinstance(e, PermanentJobError)
+        if permanent or job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.id} failed after {job.attempts} attempts: {error}")
+            async with async_session() as session:
+                await finish_job(session, job.id, "failed", error=error)
+        else:
+            delay = retry_delay(job.attempts)
+            if isinstance(e, ModelOverloaded):
+                delay = max(delay, e.retry_after)
+            logger.warning(
+                f"Job {job.id} attempt {job.attempts} failed, retrying in {delay:.1f}s: {error}"
+            )
+            async with async_session() as session:
+                await finish_job(session, job.id, "queued", error=error, retry_in=delay)
+        return
+    async with async_session() as session:
+        await finish_job(session, job.id, "succeeded", result=result)
+    logger.info(f"Job {job.id} ({job.kind}) succeeded.")
+
+
+async def job_worker(app: web.Application, worker_id: int):
+    """
+    Claims and runs jobs one at a time. When the queue is empty it sleeps until
+    a job is queued in this process or JOB_POLL_INTERVAL passes, so jobs queued
+    by other processes or due for retry are picked up too.
+    """
+    wakeup: asyncio.Event = app["job_wakeup"]
+    while True:
+        async with async_session() as session:
+            job = await claim_job(session, JOB_LEASE_SECONDS)
+        if job is None:
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        logger.info(
+            f"Worker {worker_id} running {job.kind} job {job.id} (attempt {job.attempts})."
+        )
+        await run_job(app, job)
+
+
+async def start_job_workers(app: web.Application):
+    for worker_id in range(JOB_WORKERS):
+        spawn_background(app, job_worker(app, worker_id))
+    logger.info(f"Started {JOB_WORKERS} job workers.")
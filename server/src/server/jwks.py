@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+JWKSFetcher = Callable[[], Awaitable[dict]]
+
+
+def http_jwks_fetcher(jwks_url: str, timeout: float = 5) -> JWKSFetcher:
+    async def fetch() -> dict:
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with aiohttp.ClientSession(timeout=client_timeout) as session:
+            async with session.get(jwks_url) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+    return fetch
+
+
+class JWKSCache:
+    """
+    Caches a JWKS document for `ttl` seconds.
+
+    Concurrent misses share a single fetch, entries are refreshed in the
+    background once they are within `refresh_ahead` seconds of expiring, and an
+    unknown `kid` triggers a refetch at most once every `min_refetch_interval`
+    seconds so rotated keys are picked up without letting bad tokens hammer the
+    identity provider. If a refresh fails the previous keys keep being served.
+
+    `build_key` turns each JWK into whatever `get_key` should return (e.g. a
+    ready-to-use verification key); it runs once per fetch, not per request.
+    """
+
+    def __init__(
+        self,
+        fetcher: JWKSFetcher,
+        build_key: Callable[[dict], Any] = lambda key: key,
+        ttl: float = 600,
+        refresh_ahead: float = 60,
+        min_refetch_interval: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetcher = fetcher
+        self.build_key = build_key
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self.clock = clock
+        self.jwks: Optional[dict] = None
+        self.keys_by_kid: dict[str, Any] = {}
+        self.fetched_at: float = float("-inf")
+        self.last_attempt_at: float = float("-inf")
+        self._inflight: Optional[asyncio.Task] = None
+
+    def age(self) -> float:
+        return self.clock() - self.fetched_at
+
+    def can_refetch(self) -> bool:
+        return self.clock() - self.last_attempt_at >= self.min_refetch_interval
+
+    async def get_jwks(self) -> dict:
+        if self.jwks is None:
+            return await self.refresh()
+        age = self.age()
+        if age >= self.ttl and self.can_refetch():
+            return await self.refresh()
+        if (
+            age >= self.ttl - self.refresh_ahead
+            and self._inflight is None
+            and self.can_refetch()
+        ):
+            self._start_refresh()
+        return self.jwks
+
+    async def get_key(self, kid: str) -> Optional[Any]:
+        await self.get_jwks()
+        key = self.keys_by_kid.get(kid)
+        if key is None and self.can_refetch():
+            logger.info(f"Unknown JWKS kid '{kid}', refetching keys.")
+            await self.refresh()
+            key = self.keys_by_kid.get(kid)
+        return key
+
+    async def refresh(self) -> dict:
+        if self._inflight is None:
+            self._start_refresh()
+        # Shield so one cancelled request does not cancel the shared fetch.
+        return await asyncio.shield(self._inflight)
+
+    def _start_refresh(self):
+        self._inflight = asyncio.ensure_future(self._fetch())
+        self._inflight.add_done_callback(self._clear_inflight)
+
+    def _clear_inflight(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"JWKS refresh task failed: {task.exception()}")
+
+    async def _fetch(self) -> dict:
+        self.last_attempt_at = self.clock()
+        try:
+            jwks = await self.fetcher()
+        except Exception as e:
+            if self.jwks is not None:
+                logger.warning(f"JWKS refresh failed, serving cached keys: {e}")
+                return self.jwks
+            raise
+        keys_by_kid = {}
+        for key in jwks.get("keys", []):
+            try:
+                keys_by_kid[key["kid"]] = self.build_key(key)
+            except Exception as e:
+                logger.warning(f"Skipping unusable JWKS key {key.get('kid')}: {e}")
+        self.jwks = jwks
+        self.keys_by_kid = keys_by_kid
+        self.fetched_at = self.clock()
+        logger.info("JWKS fetched and cached successfully.")
+        return jwks
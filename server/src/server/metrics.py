@@ -0,0 +1,165 @@
+from aiohttp import web
+import time
+from src.database.database import get_pool_metrics
+from src.database.query_log import DatabaseTimer, database_timer
+from .telemetry import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUEST_DB_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    render_telemetry,
+)
+
+
+def route_label(request: web.Request) -> str:
+    # The route template, not the raw path, so labels stay bounded.
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else "unmatched"
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    """
+    Records each request's latency, its time spent in database statements, and
+    how many requests are in flight, per route.
+    """
+    route = route_label(request)
+    timer = DatabaseTimer()
+    token = database_timer.set(timer)
+    HTTP_REQUESTS_IN_FLIGHT.inc(1, route)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, route, request.method, status
+        )
+        HTTP_REQUEST_DB_SECONDS.observe(timer.seconds, route)
+        HTTP_REQUESTS_IN_FLIGHT.dec(1, route)
+        database_timer.reset(token)
+
+
+def render_pool_metrics() -> list[str]:
+    pool = get_pool_metrics()
+    return [
+        "# TYPE db_pool_size gauge",
+        f"db_pool_size {pool['size']}",
+        "# TYPE db_pool_checked_out gauge",
+        f"db_pool_checked_out {pool['checked_out']}",
+        "# TYPE db_pool_idle gauge",
+        f"db_pool_idle {pool['idle']}",
+        "# TYPE db_pool_overflow gauge",
+        f"db_pool_overflow {pool['overflow']}",
+        "# TYPE db_pool_wait_seconds summary",
+        f"db_pool_wait_seconds_count {pool['wait_count']}",
+        f"db_pool_wait_seconds_sum {pool['wait_seconds_total']}",
+        "# TYPE db_pool_wait_seconds_max gauge",
+        f"db_pool_wait_seconds_max {pool['wait_seconds_max']}",
+    ]
+
+
+def render_response_cache_metrics(cache) -> list[str]:
+    if cache is None:
+        return []
+    return [
+        "# TYPE llm_cache_hits_total counter",
+        f"llm_cache_hits_total {cache.hits}",
+        "# TYPE llm_cache_misses_total counter",
+        f"llm_cache_misses_total {cache.misses}",
+        "# TYPE llm_cache_errors_total counter",
+        f"llm_cache_errors_total {cache.errors}",
+    ]
+
+
+def render_opening_pool_metrics(pool) -> list[str]:
+    if pool is None:
+        return []
+    return [
+        "# TYPE opening_pool_hits_total counter",
+        f"opening_pool_hits_total {pool.hits}",
+        "# TYPE opening_pool_misses_total counter",
+        f"opening_pool_misses_total {pool.misses}",
+        "# TYPE opening_pool_pairs gauge",
+        f"opening_pool_pairs {sum(len(topic.pairs) for topic in pool.topics.values())}",
+    ]
+
+
+def render_compression_cache_metrics(cache) -> list[str]:
+    if cache is None:
+        return []
+    return [
+        "# TYPE compressed_body_cache_hits_total counter",
+        f"compressed_body_cache_hits_total {cache.hits}",
+        "# TYPE compressed_body_cache_misses_total counter",
+        f"compressed_body_cache_misses_total {cache.misses}",
+        "# TYPE compressed_body_cache_bytes gauge",
+        f"compressed_body_cache_bytes {cache.size}",
+    ]
+
+
+def render_debate_lock_metrics(locks) -> list[str]:
+    return [
+        "# TYPE debate_locks_held gauge",
+        f"debate_locks_held {sum(lock.locked() for lock in locks.locks.values())}",
+        "# TYPE debate_lock_waiters gauge",
+        f"debate_lock_waiters {locks.waiting()}",
+    ]
+
+
+def render_scheduler_metrics(scheduler) -> list[str]:
+    lines = [
+        "# TYPE model_calls_in_flight gauge",
+        f"model_calls_in_flight {scheduler.in_flight}",
+        "# TYPE model_call_tokens_available gauge",
+        f"model_call_tokens_available {scheduler.tokens if scheduler.rate else -1}",
+    ]
+    series = [
+        ("model_call_queue_depth", "gauge", scheduler.waiting),
+        ("model_calls_admitted_total", "counter", scheduler.admitted),
+        ("model_calls_shed_total", "counter", scheduler.shed),
+        ("model_call_queue_wait_seconds_total", "counter", scheduler.wait_seconds),
+    ]
+    for name, kind, values in series:
+        lines.append(f"# TYPE {name} {kind}")
+        for priority, value in values.items():
+            lines.append(f'{name}{{priority="{priority.name.lower()}"}} {value}')
+    return lines
+
+
+def render_call_policy_metrics(policy) -> list[str]:
+    lines = []
+    for name, value in [
+        ("model_call_attempts_total", policy.attempts),
+        ("model_call_retries_total", policy.retries),
+        ("model_call_timeouts_total", policy.timeouts),
+        ("model_call_hedges_total", policy.hedges),
+        ("model_call_hedge_wins_total", policy.hedge_wins),
+        ("model_call_failures_total", policy.failures),
+    ]:
+        lines += [f"# TYPE {name} counter", f"{name} {value}"]
+    lines.append("# TYPE model_call_latency_seconds gauge")
+    for q in (0.5, 0.95, 0.99):
+        latency = policy.latency_quantile(q)
+        if latency is not None:
+            lines.append(f'model_call_latency_seconds{{quantile="{q}"}} {latency}')
+    return lines
+
+
+async def metrics_view(request) -> web.Response:
+    lines = [
+        *render_pool_metrics(),
+        *render_response_cache_metrics(request.app["response_cache"]),
+        *render_opening_pool_metrics(request.app["opening_pool"]),
+        *render_compression_cache_metrics(request.app["compressed_body_cache"]),
+        *render_debate_lock_metrics(request.app["debate_locks"]),
+        *render_scheduler_metrics(request.app["model_scheduler"]),
+        *render_call_policy_metrics(request.app["model_call_policy"]),
+        *render_telemetry(),
+    ]
+    body = "\n".join(lines) + "\n"
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OpeningPair(NamedTuple):
+    pro_text: str
+    con_text: str
+    pro_history: list[dict]
+    con_history: list[dict]
+
+
+class TopicPool(NamedTuple):
+    pairs: deque
+    requests: deque  # monotonic timestamps of recent starts on this topic
+
+
+class OpeningPool:
+    """
+    Keeps up to `size` pre-generated opening pairs for topics that were started
+    at least `hot_threshold` times within `hot_window` seconds. Handing out a
+    pair is instant; whenever a hot topic drops to `low_water` pairs or fewer a
+    single background refill per topic tops it back up. At most `max_topics`
+    topics are tracked, least recently requested first out.
+
+    Pools are keyed on the exact topic text: pairs are generated from it and
+    their chat histories quote it, so they are only handed out for that text.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[OpeningPair]],
+        spawn: Callable[[Awaitable], asyncio.Task],
+        size: int = 3,
+        low_water: int = 1,
+        hot_threshold: int = 3,
+        hot_window: float = 3600,
+        max_topics: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.generate = generate
+        self.spawn = spawn
+        self.size = size
+        self.low_water = low_water
+        self.hot_threshold = hot_threshold
+        self.hot_window = hot_window
+        self.max_topics = max_topics
+        self.clock = clock
+        self.topics: OrderedDict[str, TopicPool] = OrderedDict()
+        self.refilling: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, topic: str) -> Optional[OpeningPair]:
+        pool = self.topics.get(topic)
+        if pool is None:
+            pool = TopicPool(deque(), deque(maxlen=self.hot_threshold))
+            self.topics[topic] = pool
+            while len(self.topics) > self.max_topics:
+                self.topics.popitem(last=False)
+        self.topics.move_to_end(topic)
+
+        now = self.clock()
+        pool.requests.append(now)
+        pair = pool.pairs.popleft() if pool.pairs else None
+        if pair is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        is_hot = (
+            len(pool.requests) >= self.hot_threshold
+            and now - pool.requests[0] <= self.hot_window
+        )
+        if is_hot and len(pool.pairs) <= self.low_water and topic not in self.refilling:
+            self.refilling.add(topic)
+            self.spawn(self.refill(topic))
+        return pair
+
+    async def refill(self, topic: str):
+        try:
+            while topic in self.topics and len(self.topics[topic].pairs) < self.size:
+                pair = await self.generate(topic)
+                if topic in self.topics:
+                    self.topics[topic].pairs.append(pair)
+            logger.info(f"Opening pool for '{topic}' refilled.")
+        finally:
+            self.refilling.discard(topic)
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def response_cache_key(
+    model: str,
+    config: Optional[dict],
+    history: list[dict],
+    message: str,
+) -> str:
+    """
+    Content address of a model call. `config` carries the system instruction
+    and generation settings, so two calls share a key only when the model would
+    see exactly the same request.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "config": config or {},
+            "history": history,
+            "message": message,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryResponseCache:
+    """In-process LRU of serialized responses with a TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self.entries[key] = (value, self.clock() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def close(self):
+        self.entries.clear()
+
+
+class SQLiteResponseCache:
+    """
+    On-disk cache in a single SQLite file, shared by every worker on the host
+    and kept across restarts. Queries run in a thread so the event loop never
+    blocks on disk; the file is memory-mapped for cheap repeated reads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        ttl: float = 86400,
+        mmap_size: int = 64 * 1024 * 1024,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS response_cache_used_at "
+            "ON response_cache (used_at)"
+        )
+        self.conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key)
+            )
+            self.conn.commit()
+            return row[0]
+
+    def _set(self, key: str, value: str):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self.conn.execute(
+                "DELETE FROM response_cache WHERE expires_at <= ?", (now,)
+            )
+            self.conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY used_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ResponseCache:
+    """Counts hits and misses around a backend; backend errors count as misses."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache update failed: {e}")
+
+    async def close(self):
+        await self.backend.close()
+
+
+def create_response_cache(
+    backend: str, path: str, max_entries: int, ttl: float
+) -> Optional[ResponseCache]:
+    if backend == "memory":
+        return ResponseCache(MemoryResponseCache(max_entries=max_entries, ttl=ttl))
+    if backend == "sqlite":
+        return ResponseCache(
+            SQLiteResponseCache(path, max_entries=max_entries, ttl=ttl)
+        )
+    if backend != "off":
+        logger.warning(f"Unknown LLM_CACHE_BACKEND '{backend}', caching disabled.")
+    return None
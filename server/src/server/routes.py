@@ -5,13 +5,29 @@ from .views import (
     judge_debate_view,
     get_debate,
     get_user_debates,
+    start_debate_stream_view,
+    process_turn_stream_view,
+    closing_arguments_stream_view,
+    judge_debate_stream_view,
+    closing_arguments_job_view,
+    judge_debate_job_view,
+    get_job,
 )
+from .metrics import metrics_view
 
 
 def setup_routes(app):
+    app.router.add_get("/metrics", metrics_view)
     app.router.add_get("/get_debate", get_debate)
     app.router.add_get("/get_user_debates", get_user_debates)
     app.router.add_post("/start_debate", start_debate_view)
     app.router.add_post("/process_turn", process_turn_view)
     app.router.add_post("/closing_arguments", closing_arguments_view)
     app.router.add_post("/judge_debate", judge_debate_view)
+    app.router.add_post("/start_debate/stream", start_debate_stream_view)
+    app.router.add_post("/process_turn/stream", process_turn_stream_view)
+    app.router.add_post("/closing_arguments/stream", closing_arguments_stream_view)
+    app.router.add_post("/judge_debate/stream", judge_debate_stream_view)
+    app.router.add_post("/closing_arguments/job", closing_arguments_job_view)
+    app.router.add_post("/judge_debate/job", judge_debate_job_view)
+    app.router.add_get("/get_job", get_job)
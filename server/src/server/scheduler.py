@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower values are served first and shed last."""
+
+    INTERACTIVE = 0
+    OPENING = 1
+    JUDGE = 2
+    BACKGROUND = 3
+
+
+# Share of the queue-depth limit each priority may fill before it is shed, so
+# background and judge calls are turned away well before interactive turns.
+SHED_FRACTIONS = {
+    Priority.INTERACTIVE: 1.0,
+    Priority.OPENING: 0.75,
+    Priority.JUDGE: 0.5,
+    Priority.BACKGROUND: 0.25,
+}
+
+
+class ModelOverloaded(Exception):
+    def __init__(self, priority: Priority, retry_after: int):
+        self.priority = priority
+        self.retry_after = retry_after
+        super().__init__(
+            f"Model call queue is full for {priority.name.lower()} calls, "
+            f"retry after {retry_after}s"
+        )
+
+
+class ModelScheduler:
+    """
+    Admits model calls under a concurrency limit and a token-bucket rate limit
+    (`rate` calls per second, bursting to `burst`; a rate of 0 disables it).
+    Waiting calls are served by priority, then arrival order. Once more than a
+    priority's share of `max_queue_depth` calls are waiting, new calls of that
+    priority are rejected with ModelOverloaded instead of queueing.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        rate: float = 0,
+        burst: int = 1,
+        max_queue_depth: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_queue_depth = max_queue_depth
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.refilled_at = clock()
+        self.in_flight = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.wakeup: Optional[asyncio.TimerHandle] = None
+        self.waiting = {priority: 0 for priority in Priority}
+        self.admitted = {priority: 0 for priority in Priority}
+        self.shed = {priority: 0 for priority in Priority}
+        self.wait_seconds = {priority: 0.0 for priority in Priority}
+
+    def queue_depth(self) -> int:
+        return sum(self.waiting.values())
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current queue drains."""
+        throughput = self.rate or self.max_concurrency
+        return max(1, math.ceil(self.queue_depth() / throughput))
+
+    def refill(self):
+        if not self.rate:
+            return
+        now = self.clock()
+        elapsed = now - self.refilled_at
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.refilled_at = now
+
+    def has_token(self) -> bool:
+        if not self.rate:
+            return True
+        self.refill()
+        return self.tokens >= 1
+
+    def take_token(self):
+        if self.rate:
+            self.tokens -= 1
+
+    def dispatch(self):
+        """Hands free slots and tokens to the best waiting calls."""
+        while self.waiters and self.in_flight < self.max_concurrency:
+            _, _, future = self.waiters[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self.waiters)
+                continue
+            if not self.has_token():
+                if self.wakeup is None:
+                    delay = (1 - self.tokens) / self.rate
+                    self.wakeup = asyncio.get_running_loop().call_later(
+                        delay, self.wake
+                    )
+                return
+            heapq.heappop(self.waiters)
+            self.take_token()
+            self.in_flight += 1
+            future.set_result(None)
+
+    def wake(self):
+        self.wakeup = None
+        self.dispatch()
+
+    async def acquire(self, priority: Priority, timeout: Optional[float] = None):
+        """
+        Waits for a slot. With a `timeout`, gives up with asyncio.TimeoutError
+        once that many seconds pass in the queue.
+        """
+        if (
+            not self.waiters
+            and self.in_flight < self.max_concurrency
+            and self.has_token()
+        ):
+            self.take_token()
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            return
+
+        if self.queue_depth() >= self.max_queue_depth * SHED_FRACTIONS[priority]:
+            self.shed[priority] += 1
+            raise ModelOverloaded(priority, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self.order), future)
+        heapq.heappush(self.waiters, waiter)
+        self.waiting[priority] += 1
+        started = self.clock()
+        try:
+            self.dispatch()
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.waiters.remove(waiter)
+            heapq.heapify(self.waiters)
+            raise
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled; give the slot back.
+                self.release()
+            raise
+        finally:
+            self.waiting[priority] -= 1
+            self.wait_seconds[priority] += self.clock() - started
+        self.admitted[priority] += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, timeout: Optional[float] = None):
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@asynccontextmanager
+async def scheduled(
+    scheduler: Optional[ModelScheduler],
+    priority: Priority,
+    timeout: Optional[float] = None,
+):
+    """Holds a scheduler slot for the block, or nothing without a scheduler."""
+    if scheduler is None:
+        yield
+        return
+    async with scheduler.slot(priority, timeout):
+        yield
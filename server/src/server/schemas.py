@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate, ValidationError
 from enum import Enum
 
 
@@ -97,6 +97,7 @@ class JudgeDebateResponse(Schema):
 
 class GetDebateRequest(Schema):
     debate_id = fields.Integer(required=True)
+    since = fields.Integer(missing=None, validate=validate.Range(min=0))
 
 
 class GetDebateResponse(Schema):
@@ -106,14 +107,76 @@ class GetDebateResponse(Schema):
     questions = fields.List(fields.String)
     logs = fields.List(fields.Nested(DebateLog))
     winner = fields.String(required=False, allow_none=True)
+    cursor = fields.Integer(required=True)
+
+
+DEBATE_SUMMARY_FIELDS = (
+    "id",
+    "user_id",
+    "topic",
+    "questions",
+    "winner",
+    "created_at",
+)
+DEFAULT_DEBATE_SUMMARY_FIELDS = ("id", "topic", "winner", "created_at")
+
+
+def validate_summary_fields(value: str):
+    unknown = set(value.split(",")) - set(DEBATE_SUMMARY_FIELDS)
+    if unknown:
+        raise ValidationError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(DEBATE_SUMMARY_FIELDS)}."
+        )
+
+
+class DebateSummary(Schema):
+    id = fields.Integer()
+    user_id = fields.Integer()
+    topic = fields.String()
+    questions = fields.List(fields.String)
+    winner = fields.String(allow_none=True)
+    created_at = fields.DateTime()
 
 
 class GetUserDebatesResponse(Schema):
-    debates = fields.List(fields.Nested(GetDebateResponse), required=True)
+    debates = fields.List(fields.Nested(DebateSummary), required=True)
+    next_cursor = fields.String(allow_none=True)
 
 
 class GetUserDebatesRequest(Schema):
     user_id = fields.Integer(required=False, allow_none=True, missing=None)
+    limit = fields.Integer(missing=20, validate=validate.Range(min=1, max=100))
+    cursor = fields.String(missing=None)
+    # Schema already has a `fields` attribute, so the parameter is renamed.
+    projection = fields.String(
+        data_key="fields",
+        missing=",".join(DEFAULT_DEBATE_SUMMARY_FIELDS),
+        validate=validate_summary_fields,
+    )
+
+
+class StreamRequest(Schema):
+    stream_tokens = fields.Boolean(required=False, missing=False)
+
+
+class EnqueueJobResponse(Schema):
+    job_id = fields.Integer(required=True)
+    status = fields.String(required=True)
+
+
+class GetJobRequest(Schema):
+    job_id = fields.Integer(required=True)
+
+
+class GetJobResponse(Schema):
+    job_id = fields.Integer(required=True)
+    debate_id = fields.Integer(required=True)
+    kind = fields.String(required=True)
+    status = fields.String(required=True)
+    attempts = fields.Integer(required=True)
+    result = fields.Dict(allow_none=True)
+    error = fields.String(allow_none=True)
 
 
 class SignupRequest(Schema):
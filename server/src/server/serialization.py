@@ -0,0 +1,116 @@
+import functools
+import json
+from collections.abc import Mapping
+from typing import Any, Callable, Iterable, Optional
+
+from aiohttp import web
+from marshmallow import Schema, fields
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+MISSING = object()
+
+
+def dumps(data: Any) -> bytes:
+    """Encodes `data` as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(
+        data, separators=(",", ":"), ensure_ascii=False, default=str
+    ).encode("utf-8")
+
+
+def json_response(data: Any, status: int = 200, headers=None) -> web.Response:
+    return web.Response(
+        body=dumps(data),
+        status=status,
+        headers=headers,
+        content_type="application/json",
+    )
+
+
+def get_value(obj: Any, key: str) -> Any:
+    if isinstance(obj, Mapping):
+        return obj.get(key, MISSING)
+    return getattr(obj, key, MISSING)
+
+
+def nested_schema(field: fields.Nested) -> type[Schema]:
+    nested = field.nested
+    return nested if isinstance(nested, type) else type(nested)
+
+
+def field_encoder(field: fields.Field) -> Optional[Callable[[Any], Any]]:
+    """
+    Returns the conversion a field needs to become JSON, or None when the value
+    can be emitted as is. Values are trusted, so no coercion or validation.
+    """
+    if isinstance(field, fields.Nested):
+        encode = compile_serializer(nested_schema(field))
+        if field.many:
+            return lambda value: [encode(item) for item in value]
+        return encode
+    if isinstance(field, fields.List):
+        inner = field_encoder(field.inner)
+        if inner is None:
+            return list
+        return lambda value: [
+            inner(item) if item is not None else None for item in value
+        ]
+    if isinstance(field, fields.DateTime):
+        return lambda value: value.isoformat()
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def compile_serializer(
+    schema: type[Schema], only: Optional[tuple[str, ...]] = None
+) -> Callable[[Any], dict]:
+    """
+    Builds a function that dumps an object the way `schema().dump` would for
+    server-built data: declared fields in order, missing keys skipped, nested
+    schemas and datetimes converted. It skips marshmallow's per-field
+    machinery, so it must not be used on untrusted input.
+    """
+    plan = []
+    for name, field in schema._declared_fields.items():
+        if field.load_only or (only is not None and name not in only):
+            continue
+        plan.append(
+            (field.attribute or name, field.data_key or name, field_encoder(field))
+        )
+
+    def serialize(obj: Any) -> dict:
+        result = {}
+        for attribute, key, encode in plan:
+            value = get_value(obj, attribute)
+            if value is MISSING:
+                continue
+            if encode is not None and value is not None:
+                value = encode(value)
+            result[key] = value
+        return result
+
+    return serialize
+
+
+def normalize_only(only: Optional[Iterable[str]]) -> Optional[tuple[str, ...]]:
+    # Fields are emitted in declaration order anyway, so reordered or repeated
+    # names (e.g. from a client's projection) share one compiled serializer.
+    return tuple(sorted(set(only))) if only is not None else None
+
+
+def serialize(
+    schema: type[Schema], obj: Any, only: Optional[Iterable[str]] = None
+) -> dict:
+    return compile_serializer(schema, normalize_only(only))(obj)
+
+
+def serialize_many(
+    schema: type[Schema], objs: Iterable[Any], only: Optional[Iterable[str]] = None
+) -> list[dict]:
+    encode = compile_serializer(schema, normalize_only(only))
+    return [encode(obj) for obj in objs]
@@ -0,0 +1,20 @@
+from aiohttp import web
+from .serialization import dumps
+
+
+async def prepare_event_stream(request: web.Request) -> web.StreamResponse:
+    response = web.StreamResponse(
+        status=200,
+        headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+    await response.prepare(request)
+    return response
+
+
+async def send_event(response: web.StreamResponse, event: str, data: dict):
+    header = f"event: {event}\ndata: ".encode("utf-8")
+    await response.write(header + dumps(data) + b"\n\n")
@@ -0,0 +1,141 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterable
+
+# Request, phase and model call latencies span milliseconds to a minute.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, *label_values):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(
+                f"{self.name}{format_labels(self.labels, label_values)} {value}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, amount: float = 1, *label_values):
+        self.inc(-amount, *label_values)
+
+    def render(self) -> list[str]:
+        return [f"# TYPE {self.name} gauge", *super().render()[1:]]
+
+
+class Histogram:
+    """
+    Prometheus histogram. Observing is a bisect and two additions; buckets are
+    only made cumulative when rendered.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observes the block's duration, with an outcome label of ok or error."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(time.perf_counter() - started, *label_values, outcome)
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} histogram"]
+        bounds = [*(str(bucket) for bucket in self.buckets), "+Inf"]
+        for label_values, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = format_labels((*self.labels, "le"), (*label_values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", ("route", "method", "status")
+)
+HTTP_REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", ("route",))
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", ("route",))
+DEBATE_PHASE_SECONDS = Histogram("debate_phase_duration_seconds", ("phase", "outcome"))
+DEBATE_PHASES_IN_FLIGHT = Gauge("debate_phases_in_flight", ("phase",))
+MODEL_CALL_SECONDS = Histogram(
+    "model_call_duration_seconds", ("operation", "priority", "outcome")
+)
+MODEL_TOKENS = Counter("model_tokens_total", ("operation", "kind"))
+
+INSTRUMENTS = (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUEST_DB_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    DEBATE_PHASE_SECONDS,
+    DEBATE_PHASES_IN_FLIGHT,
+    MODEL_CALL_SECONDS,
+    MODEL_TOKENS,
+)
+
+
+@contextmanager
+def phase_timer(phase: str):
+    DEBATE_PHASES_IN_FLIGHT.inc(1, phase)
+    try:
+        with DEBATE_PHASE_SECONDS.time(phase):
+            yield
+    finally:
+        DEBATE_PHASES_IN_FLIGHT.dec(1, phase)
+
+
+def record_usage(operation: str, usage) -> None:
+    """Counts the tokens reported in a response's usage_metadata."""
+    if usage is None:
+        return
+    for kind in ("prompt", "candidates", "cached_content", "thoughts"):
+        count = getattr(usage, f"{kind}_token_count", None)
+        if count:
+            MODEL_TOKENS.inc(count, operation, kind)
+
+
+def render_telemetry() -> list[str]:
+    return [line for instrument in INSTRUMENTS for line in instrument.render()]
@@ -0,0 +1,59 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class VerifiedTokenCache:
+    """
+    LRU cache of claims for tokens whose signature has already been verified.
+
+    Entries are keyed by a SHA-256 of the raw token, so the tokens themselves
+    are never held in memory, and each entry expires at the earlier of the
+    token's `exp` claim and `max_age` seconds after it was verified.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        max_age: float = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def token_hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.token_hash(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict):
+        if self.max_size <= 0 or "exp" not in claims:
+            return
+        now = self.clock()
+        expires_at = min(float(claims["exp"]), now + self.max_age)
+        if expires_at <= now:
+            return
+        key = self.token_hash(token)
+        self.entries[key] = (claims, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
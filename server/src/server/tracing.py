@@ -0,0 +1,472 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import aiohttp
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+MAX_STATEMENT_LENGTH = 500
+WATERFALL_WIDTH = 40
+
+# OTLP span kinds.
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: dict = {}
+        self.error: Optional[str] = None
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """The spans recorded while handling one request."""
+
+    def __init__(
+        self,
+        request_id: str,
+        trace_id: Optional[str] = None,
+        sampled: bool = False,
+        max_spans: int = 1000,
+    ):
+        self.request_id = request_id
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+    def start_span(
+        self, name: str, parent_id: Optional[str], kind: int = INTERNAL
+    ) -> Optional[Span]:
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(self, name, parent_id, kind)
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "dropped_spans": self.dropped,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+def start_span(name: str, kind: int = INTERNAL, **attributes) -> Optional[Span]:
+    """
+    Starts a span under the current one, or returns None when the current task
+    is not being traced. The caller must finish it.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return None
+    parent = current_span.get()
+    span = trace.start_span(name, parent.span_id if parent else None, kind)
+    if span is not None:
+        span.attributes.update(attributes)
+    return span
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """Traces the block as a child of the current span. Yields the span or None."""
+    current = start_span(name, kind, **attributes)
+    if current is None:
+        yield None
+        return
+    token = current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(e)
+        raise
+    else:
+        current.finish()
+    finally:
+        current_span.reset(token)
+
+
+def render_waterfall(trace: Trace) -> str:
+    """One line per span: start offset, duration, nesting and a timeline bar."""
+    if not trace.spans:
+        return ""
+    origin = min(s.start_ns for s in trace.spans)
+    total_ms = max(
+        max((s.start_ns - origin) / 1e6 + s.duration_ms for s in trace.spans), 0.001
+    )
+    depths: dict[str, int] = {}
+    lines = []
+    for s in sorted(trace.spans, key=lambda s: s.start_ns):
+        depth = depths.get(s.parent_id, -1) + 1
+        depths[s.span_id] = depth
+        offset_ms = (s.start_ns - origin) / 1e6
+        left = int(offset_ms / total_ms * WATERFALL_WIDTH)
+        width = max(1, int(s.duration_ms / total_ms * WATERFALL_WIDTH))
+        bar = (" " * left + "=" * width)[:WATERFALL_WIDTH].ljust(WATERFALL_WIDTH)
+        error = f" !{s.error}" if s.error else ""
+        lines.append(
+            f"{offset_ms:9.1f}ms {s.duration_ms:9.1f}ms |{bar}| "
+            f"{'  ' * depth}{s.name}{error}"
+        )
+    return "\n".join(lines)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id to every log record as `request_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+def otlp_attributes(attributes: dict) -> list[dict]:
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            values.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            values.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            values.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            values.append({"key": key, "value": {"stringValue": str(value)}})
+    return values
+
+
+def otlp_span(trace: Trace, span: Span) -> dict:
+    encoded = {
+        "traceId": trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": otlp_attributes(
+            {"request.id": trace.request_id, **span.attributes}
+        ),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+class FileTraceWriter:
+    """Appends each trace to a file as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, lines: list[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def write(self, traces: list[Trace]):
+        lines = [json.dumps(trace.to_dict(), default=str) + "\n" for trace in traces]
+        await asyncio.to_thread(self.append, lines)
+
+    async def close(self):
+        pass
+
+
+class OTLPTraceWriter:
+    """Posts traces to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def write(self, traces: list[Trace]):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": otlp_attributes(
+                            {"service.name": self.service_name}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [
+                                otlp_span(trace, s)
+                                for trace in traces
+                                for s in trace.spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+        async with self.session.post(self.endpoint, json=body) as resp:
+            resp.raise_for_status()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+class TraceExporter:
+    """
+    Buffers finished traces and hands them to the writer in batches every
+    `interval` seconds, off the request path. When the buffer is full new
+    traces are dropped rather than growing without bound.
+    """
+
+    def __init__(self, writer, interval: float = 5, max_buffered: int = 1000):
+        self.writer = writer
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self.buffer: list[Trace] = []
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, trace: Trace):
+        if len(self.buffer) >= self.max_buffered:
+            self.dropped += 1
+            return
+        self.buffer.append(trace)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        try:
+            await self.writer.write(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"Failed to export {len(batch)} traces: {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self):
+        await self.flush()
+        await self.writer.close()
+
+
+def create_trace_exporter(
+    kind: str,
+    path: str,
+    endpoint: str,
+    service_name: str,
+    interval: float = 5,
+    max_buffered: int = 1000,
+) -> Optional[TraceExporter]:
+    if kind == "file":
+        writer = FileTraceWriter(path)
+    elif kind == "otlp":
+        writer = OTLPTraceWriter(endpoint, service_name)
+    else:
+        if kind != "off":
+            logger.warning(f"Unknown trace exporter '{kind}', tracing export is off.")
+        return None
+    return TraceExporter(writer, interval=interval, max_buffered=max_buffered)
+
+
+def incoming_request_id(request: web.Request) -> str:
+    value = request.headers.get(REQUEST_ID_HEADER, "")
+    return value if REQUEST_ID_PATTERN.match(value) else uuid.uuid4().hex
+
+
+async def add_request_id_header(request: web.Request, response: web.StreamResponse):
+    """
+    on_response_prepare hook echoing the request id. Headers are sent when a
+    response is prepared, which for streamed responses is before the handler
+    returns, so the middleware cannot add it afterwards.
+    """
+    rid = request.get("request_id")
+    if rid is not None:
+        response.headers[REQUEST_ID_HEADER] = rid
+
+
+def create_tracing_middleware(
+    exporter: Optional[TraceExporter],
+    sample_rate: float = 0.1,
+    slow_request_ms: float = 1000,
+    max_spans: int = 1000,
+):
+    """
+    Gives every request an id (taken from X-Request-ID when the client sent a
+    sane one) that is attached to log records, and echoed back once
+    add_request_id_header is registered on the app. With an exporter or a
+    slow-request threshold, it also records a trace of the request. A W3C
+    traceparent header is continued. Sampled traces are exported, and so is
+    every trace slower than `slow_request_ms`, which also gets its waterfall
+    logged.
+    """
+    tracing = exporter is not None or slow_request_ms > 0
+
+    @web.middleware
+    async def tracing_middleware(request: web.Request, handler):
+        rid = incoming_request_id(request)
+        request["request_id"] = rid
+        rid_token = request_id.set(rid)
+        if not tracing:
+            try:
+                return await handler(request)
+            finally:
+                request_id.reset(rid_token)
+
+        match = TRACEPARENT_PATTERN.match(request.headers.get("traceparent", ""))
+        trace = Trace(
+            rid,
+            trace_id=match.group(1) if match else None,
+            sampled=random.random() < sample_rate,
+            max_spans=max_spans,
+        )
+        trace_token = current_trace.set(trace)
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else "unmatched"
+        # None when max_spans is 0; the request is then timed but not traced.
+        root = trace.start_span(
+            f"{request.method} {route}",
+            match.group(2) if match else None,
+            SERVER,
+        )
+        if root is not None:
+            root.attributes.update(
+                {
+                    "http.method": request.method,
+                    "http.route": route,
+                    "http.path": request.path,
+                }
+            )
+        span_token = current_span.set(root)
+        started = time.perf_counter()
+        error = None
+        status = None
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if root is not None:
+                if status is not None:
+                    root.attributes["http.status_code"] = status
+                root.finish(error)
+            current_span.reset(span_token)
+            current_trace.reset(trace_token)
+            slow = slow_request_ms > 0 and duration_ms >= slow_request_ms
+            if slow:
+                logger.warning(
+                    f"Slow request {request.method} {request.path} took "
+                    f"{duration_ms:.1f}ms (request id {rid}, trace "
+                    f"{trace.trace_id}):\n{render_waterfall(trace)}"
+                )
+            if exporter is not None and (trace.sampled or slow):
+                exporter.submit(trace)
+            request_id.reset(rid_token)
+
+    return tracing_middleware
+
+
+def install_statement_tracing(engine: AsyncEngine):
+    """Opens a client span around every statement run for a traced request."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        statement_span = start_span(
+            "db.statement",
+            CLIENT,
+            **{
+                "db.system": "postgresql",
+                "db.statement": " ".join(statement.split())[:MAX_STATEMENT_LENGTH],
+            },
+        )
+        conn.info.setdefault("trace_spans", []).append(statement_span)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("trace_spans"):
+            statement_span = conn.info["trace_spans"].pop()
+            if statement_span is not None:
+                statement_span.finish(exception_context.original_exception)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statement_span = conn.info["trace_spans"].pop()
+        if statement_span is not None:
+            statement_span.attributes["db.rows"] = cursor.rowcount
+            statement_span.finish()
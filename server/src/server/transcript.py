@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Optional
+from google import genai
+from .utils import estimate_tokens, generate_text_content
+from .scheduler import ModelScheduler, Priority
+from .call_policy import ModelCallPolicy
+
+logger = logging.getLogger(__name__)
+
+ENTRY_LABELS = {
+    "opening_statement": "",
+    "intitial_question_response": " answer",
+    "rebuttal": " rebuttal",
+    "closing_argument": "",
+}
+
+
+def transcript_sections(logs: list[dict]) -> list[tuple[str, list[str]]]:
+    """
+    Groups debate logs into (heading, lines) sections: the openings, one per
+    moderator question and the closings. Narration, the judgment and the other
+    moderator boilerplate carry no arguments and are dropped.
+    """
+    sections = []
+    question_count = 0
+    for entry in logs:
+        speaker = entry["speaker"]
+        response_type = entry["response_type"]
+        text = " ".join(entry["text"].split())
+        if speaker == "moderator":
+            if response_type == "intitial_question_response":
+                question_count += 1
+                sections.append((f"[Q{question_count}] {text}", []))
+            elif response_type == "opening_statement":
+                sections.append(("[Opening]", []))
+            elif response_type == "closing_argument":
+                sections.append(("[Closing]", []))
+            continue
+        if response_type not in ENTRY_LABELS:
+            continue
+        if not sections:
+            sections.append(("[Opening]", []))
+        label = f"{speaker.upper()}{ENTRY_LABELS[response_type]}"
+        sections[-1][1].append(f"{label}: {text}")
+    return sections
+
+
+def render_sections(sections: list[tuple[str, list[str]]]) -> str:
+    return "\n".join(
+        "\n".join([heading, *lines]) for heading, lines in sections if lines
+    )
+
+
+def render_transcript(logs: list[dict]) -> str:
+    return render_sections(transcript_sections(logs))
+
+
+async def summarize_section(
+    client: genai.Client,
+    model_name: str,
+    heading: str,
+    lines: list[str],
+    scheduler: Optional[ModelScheduler] = None,
+    policy: Optional[ModelCallPolicy] = None,
+) -> tuple[str, list[str]]:
+    try:
+        response = await generate_text_content(
+            client,
+            "\n".join(lines),
+            system_instructions="Summarize this exchange from a debate in at most two lines, one starting 'PRO:' and one starting 'CON:', keeping each side's strongest points.",
+            model_name=model_name,
+            max_output_tokens=120,
+            scheduler=scheduler,
+            priority=Priority.JUDGE,
+            policy=policy,
+        )
+    except Exception as e:
+        logger.warning(f"Could not summarize transcript section {heading}: {e}")
+        return heading, lines
+    return heading, [line for line in response.text.strip().splitlines() if line]
+
+
+async def build_judge_transcript(
+    client: genai.Client,
+    model_name: str,
+    logs: list[dict],
+    token_budget: int,
+    scheduler: Optional[ModelScheduler] = None,
+    policy: Optional[ModelCallPolicy] = None,
+) -> tuple[str, int]:
+    """
+    Renders the compact transcript the judge sees and returns it with its
+    estimated token count. When the transcript exceeds `token_budget`, each
+    question section is summarized (concurrently) while the openings and
+    closings stay verbatim.
+    """
+    sections = transcript_sections(logs)
+    transcript = render_sections(sections)
+    tokens = estimate_tokens(transcript)
+    if tokens > token_budget:
+        sections = await asyncio.gather(
+            *(
+                (
+                    summarize_section(
+                        client, model_name, heading, lines, scheduler, policy
+                    )
+                    if heading.startswith("[Q") and lines
+                    else asyncio.sleep(0, result=(heading, lines))
+                )
+                for heading, lines in sections
+            )
+        )
+        summarized = render_sections(sections)
+        logger.info(
+            f"Judge transcript over budget ({tokens} > {token_budget} tokens), "
+            f"summarized to {estimate_tokens(summarized)} tokens."
+        )
+        transcript = summarized
+        tokens = estimate_tokens(transcript)
+    logger.info(f"Judge transcript: {len(logs)} log entries, ~{tokens} tokens.")
+    return transcript, tokens
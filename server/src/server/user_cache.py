@@ -0,0 +1,86 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UserIdCache:
+    """
+    Bounded in-process LRU mapping an auth provider `sub` to our user.id.
+
+    An optional shared backend (anything with redis-style async `get(key)` and
+    `set(key, value, ex=seconds)`, e.g. `redis.asyncio.Redis`) lets several
+    server processes share lookups; it is consulted only on a local miss and
+    its failures are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 3600,
+        shared=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    @staticmethod
+    def shared_key(auth_id: str) -> str:
+        return f"debates:user_id:{auth_id}"
+
+    async def get(self, auth_id: str) -> Optional[int]:
+        entry = self.entries.get(auth_id)
+        if entry is not None:
+            user_id, expires_at = entry
+            if expires_at > self.clock():
+                self.entries.move_to_end(auth_id)
+                return user_id
+            del self.entries[auth_id]
+
+        if self.shared is None:
+            return None
+        try:
+            value = await self.shared.get(self.shared_key(auth_id))
+        except Exception as e:
+            logger.warning(f"Shared user id cache lookup failed: {e}")
+            return None
+        if value is None:
+            return None
+        self._store(auth_id, int(value))
+        return int(value)
+
+    async def set(self, auth_id: str, user_id: int):
+        self._store(auth_id, user_id)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(self.shared_key(auth_id), user_id, ex=int(self.ttl))
+        except Exception as e:
+            logger.warning(f"Shared user id cache update failed: {e}")
+
+    def _store(self, auth_id: str, user_id: int):
+        if self.max_size <= 0:
+            return
+        self.entries[auth_id] = (user_id, self.clock() + self.ttl)
+        self.entries.move_to_end(auth_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def create_shared_backend(redis_url: Optional[str]):
+    if not redis_url:
+        return None
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.warning(
+            "USER_CACHE_REDIS_URL is set but the redis package is not installed; "
+            "using the in-process user id cache only."
+        )
+        return None
+    return redis.from_url(redis_url)
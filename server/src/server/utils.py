@@ -1,13 +1,229 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Union
+
+import httpx
 from google import genai
-from google.genai.types import Content, GenerateContentResponse
+from google.genai.types import Candidate, Content, GenerateContentResponse, Part
 from google.genai.chats import AsyncChats
+from .response_cache import ResponseCache, response_cache_key
+from .scheduler import ModelScheduler, ModelOverloaded, Priority, scheduled
+from .call_policy import ModelCallPolicy
+from .telemetry import MODEL_CALL_SECONDS, phase_timer, record_usage
+from .tracing import CLIENT, span
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseError(Exception):
+    def __init__(self, phase: str, failures: dict[str, BaseException]):
+        self.phase = phase
+        self.failures = failures
+        sides = ", ".join(sorted(failures))
+        super().__init__(f"Model call failed during {phase} for: {sides}")
+
+
+def create_genai_client(
+    api_key: str,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+) -> tuple[genai.Client, httpx.AsyncHTTPTransport]:
+    """
+    Builds the application-wide genai client on top of a transport we own, so
+    every model call reuses the same keep-alive connection pool and the pool can
+    be closed on shutdown.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+    client = genai.Client(
+        api_key=api_key,
+        http_options=genai.types.HttpOptions(
+            async_client_args={"transport": transport}
+        ),
+    )
+    return client, transport
+
+
+def dump_contents(contents: list[Content]) -> list[dict]:
+    return [content.model_dump(mode="json", exclude_none=True) for content in contents]
+
+
+def chat_cache_key(chat: AsyncChats, message: str) -> str:
+    # The chat keeps its model and config private; they are part of the request.
+    config = chat._config
+    return response_cache_key(
+        chat._model,
+        config.model_dump(mode="json", exclude_none=True) if config else None,
+        dump_contents(chat.get_history(curated=True)),
+        message,
+    )
 
 
-async def send_chat_message(chat: AsyncChats, message: str) -> GenerateContentResponse:
-    response = await chat.send_message(message)
+def is_cacheable(response: GenerateContentResponse) -> bool:
+    return bool(
+        response.candidates and response.candidates[0].content and response.text
+    )
+
+
+def record_exchange(chat: AsyncChats, message: str, response: GenerateContentResponse):
+    """Records an exchange in the chat the way send_message would."""
+    content = response.candidates[0].content if response.candidates else None
+    chat.record_history(
+        user_input=Content(role="user", parts=[Part(text=message)]),
+        model_output=[content] if content else [],
+        automatic_function_calling_history=[],
+        is_valid=is_cacheable(response),
+    )
+
+
+async def call_model(
+    operation: str,
+    request: Callable[[], Awaitable],
+    scheduler: Optional[ModelScheduler],
+    priority: Priority,
+    policy: Optional[ModelCallPolicy],
+    **policy_options,
+):
+    """
+    Runs one logical model call, timed from the moment it asks the scheduler
+    for a slot until its last attempt finishes.
+    """
+    with span(
+        f"gemini.{operation}", CLIENT, priority=priority.name.lower()
+    ) as call_span, MODEL_CALL_SECONDS.time(operation, priority.name.lower()):
+        if policy is None:
+            async with scheduled(scheduler, priority):
+                response = await request()
+        else:
+            response = await policy.call(request, scheduler, priority, **policy_options)
+        usage = getattr(response, "usage_metadata", None)
+        if call_span is not None and usage is not None:
+            call_span.attributes.update(
+                {
+                    "gemini.prompt_tokens": usage.prompt_token_count or 0,
+                    "gemini.candidates_tokens": usage.candidates_token_count or 0,
+                }
+            )
+        return response
+
+
+async def send_chat_message(
+    chat: AsyncChats,
+    message: str,
+    cache: Optional[ResponseCache] = None,
+    scheduler: Optional[ModelScheduler] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    policy: Optional[ModelCallPolicy] = None,
+) -> GenerateContentResponse:
+    key = chat_cache_key(chat, message) if cache is not None else None
+    if key is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            response = GenerateContentResponse.model_validate_json(cached)
+            record_exchange(chat, message, response)
+            return response
+
+    # Same request as chat.send_message, but the chat is only updated once the
+    # call has succeeded, so retried and hedged attempts can never both land
+    # in its history.
+    contents = [
+        *chat.get_history(curated=True),
+        Content(role="user", parts=[Part(text=message)]),
+    ]
+
+    def request():
+        return chat._modules.generate_content(
+            model=chat._model, contents=contents, config=chat._config
+        )
+
+    response = await call_model("chat", request, scheduler, priority, policy)
+    record_usage("chat", response.usage_metadata)
+    record_exchange(chat, message, response)
+    if key is not None and is_cacheable(response):
+        await cache.set(key, response.model_dump_json(exclude_none=True))
     return response
 
 
+async def stream_chat_message(
+    chat: AsyncChats,
+    message: str,
+    on_text: Callable[[str], Awaitable[None]],
+    cache: Optional[ResponseCache] = None,
+    scheduler: Optional[ModelScheduler] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    policy: Optional[ModelCallPolicy] = None,
+) -> str:
+    """
+    Sends a chat message through the streaming API, handing each text chunk to
+    on_text as it arrives, and returns the full response text. A cached
+    response is handed over as a single chunk. Streams are never hedged, and
+    are only retried if they failed before producing any text. The chat
+    records the reply as one model turn, however many chunks it came in.
+    """
+    key = chat_cache_key(chat, message) if cache is not None else None
+    if key is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            response = GenerateContentResponse.model_validate_json(cached)
+            record_exchange(chat, message, response)
+            await on_text(response.text)
+            return response.text
+
+    # As in send_chat_message, the chat is only updated once the stream has
+    # finished.
+    contents = [
+        *chat.get_history(curated=True),
+        Content(role="user", parts=[Part(text=message)]),
+    ]
+    chunks = []
+    usage = []
+    finish_reason = []
+
+    async def request():
+        stream = await chat._modules.generate_content_stream(
+            model=chat._model, contents=contents, config=chat._config
+        )
+        async for chunk in stream:
+            if chunk.usage_metadata is not None:
+                # Each chunk reports the running totals; keep the last.
+                usage[:] = [chunk.usage_metadata]
+            if chunk.candidates and chunk.candidates[0].finish_reason is not None:
+                finish_reason[:] = [chunk.candidates[0].finish_reason]
+            if chunk.text:
+                chunks.append(chunk.text)
+                await on_text(chunk.text)
+
+    await call_model(
+        "stream",
+        request,
+        scheduler,
+        priority,
+        policy,
+        hedge=False,
+        can_retry=lambda: not chunks,
+    )
+    record_usage("stream", usage[0] if usage else None)
+    text = "".join(chunks)
+    reply = Candidate(
+        content=Content(role="model", parts=[Part(text=text)]),
+        finish_reason=finish_reason[0] if finish_reason else None,
+    )
+    response = GenerateContentResponse(
+        candidates=[reply] if text else [],
+        usage_metadata=usage[0] if usage else None,
+    )
+    record_exchange(chat, message, response)
+    if key is not None and is_cacheable(response):
+        await cache.set(key, response.model_dump_json(exclude_none=True))
+    return text
+
+
 def start_chat(
     client,
     system_instructions: str,
@@ -32,13 +248,156 @@ async def generate_text_content(
     system_instructions: str,
     model_name: str,
     max_output_tokens: int = 100,
+    cache: Optional[ResponseCache] = None,
+    scheduler: Optional[ModelScheduler] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    policy: Optional[ModelCallPolicy] = None,
 ) -> GenerateContentResponse:
-    question_response = await client.aio.models.generate_content(
-        model=model_name,
-        contents=[text],
-        config=genai.types.GenerateContentConfig(
-            max_output_tokens=max_output_tokens,
-            system_instruction=system_instructions,
-        ),
+    config = genai.types.GenerateContentConfig(
+        max_output_tokens=max_output_tokens,
+        system_instruction=system_instructions,
     )
+    if cache is not None:
+        key = response_cache_key(
+            model_name, config.model_dump(mode="json", exclude_none=True), [], text
+        )
+        cached = await cache.get(key)
+        if cached is not None:
+            return GenerateContentResponse.model_validate_json(cached)
+
+    def request():
+        return client.aio.models.generate_content(
+            model=model_name,
+            contents=[text],
+            config=config,
+        )
+
+    question_response = await call_model("text", request, scheduler, priority, policy)
+    record_usage("text", question_response.usage_metadata)
+    if cache is not None and is_cacheable(question_response):
+        await cache.set(key, question_response.model_dump_json(exclude_none=True))
     return question_response
+
+
+async def run_phase(
+    phase: str, **calls: Awaitable[Union[GenerateContentResponse, str]]
+) -> dict[str, str]:
+    """
+    Runs the independent model calls of a debate phase concurrently and returns
+    the response text keyed by side. Calls may resolve to a model response or,
+    when streamed, to the already-joined text. Every call is allowed to finish
+    so a single failure never leaves a sibling call dangling; if any call failed
+    a PhaseError listing the failed sides is raised instead. A call shed by the
+    scheduler is re-raised as is, since the model itself did not fail.
+    """
+    sides = list(calls)
+    with span(f"phase.{phase}"), phase_timer(phase):
+        results = await asyncio.gather(*calls.values(), return_exceptions=True)
+        failures = {
+            side: result
+            for side, result in zip(sides, results)
+            if isinstance(result, BaseException)
+        }
+        for error in failures.values():
+            if isinstance(error, ModelOverloaded):
+                raise error
+        if failures:
+            for side, error in failures.items():
+                logger.error(
+                    f"{phase} call for {side} failed: {type(error).__name__} - {error}"
+                )
+            raise PhaseError(phase, failures)
+    return {
+        side: result if isinstance(result, str) else result.text
+        for side, result in zip(sides, results)
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text; good enough for budgeting.
+    return (len(text) + 3) // 4
+
+
+def content_text(content: dict) -> str:
+    return " ".join(part.get("text") or "" for part in content.get("parts") or [])
+
+
+def summary_exchange(summary: str) -> list[dict]:
+    return [
+        {
+            "role": "user",
+            "parts": [{"text": f"Summary of the debate so far: {summary}"}],
+        },
+        {"role": "model", "parts": [{"text": "Understood."}]},
+    ]
+
+
+def contents_tokens(contents: list[dict]) -> int:
+    return sum(estimate_tokens(content_text(content)) for content in contents)
+
+
+def window_start(
+    contents: list[dict], token_budget: int, keep_exchanges: Optional[int] = None
+) -> int:
+    """
+    Returns the index of the first content to keep verbatim: the start of the
+    oldest exchange from which at most `keep_exchanges` exchanges (any number
+    if None) follow and fit `token_budget`. Exchanges start at a user turn,
+    however many model contents follow it. The latest exchange is always kept.
+    """
+    starts = [
+        index for index, content in enumerate(contents) if content.get("role") == "user"
+    ]
+    if keep_exchanges is not None:
+        starts = starts[-keep_exchanges:] if keep_exchanges > 0 else []
+    if not starts:
+        return len(contents)
+    for start in starts[:-1]:
+        if contents_tokens(contents[start:]) <= token_budget:
+            return start
+    return starts[-1]
+
+
+def compact_history(
+    history: list[dict], summary: Optional[str], token_budget: int
+) -> list[dict]:
+    """
+    Builds the history to seed a chat with: the rolling summary (if any) as a
+    synthetic first exchange, followed by every exchange it does not cover,
+    verbatim. fold_history keeps that tail within the window and budget; only
+    if it still overflows `token_budget` are its oldest exchanges dropped.
+    """
+    prefix = summary_exchange(summary) if summary else []
+    start = window_start(history, token_budget - contents_tokens(prefix))
+    return prefix + history[start:]
+
+
+async def summarize_history(
+    client: genai.Client,
+    model_name: str,
+    previous_summary: Optional[str],
+    contents: list[dict],
+    max_output_tokens: int = 300,
+    scheduler: Optional[ModelScheduler] = None,
+    policy: Optional[ModelCallPolicy] = None,
+) -> str:
+    """Folds `contents` into `previous_summary`, returning the new rolling summary."""
+    transcript = "\n".join(
+        f"{content.get('role')}: {content_text(content)}" for content in contents
+    )
+    text = (
+        f"Previous summary: {previous_summary or 'None'}\n"
+        f"New exchanges:\n{transcript}\n"
+        "Write an updated summary of the arguments made so far."
+    )
+    response = await generate_text_content(
+        client,
+        text,
+        system_instructions="You condense debate transcripts. Keep every distinct argument and rebuttal, drop repetition, and write in plain prose.",
+        model_name=model_name,
+        max_output_tokens=max_output_tokens,
+        scheduler=scheduler,
+        priority=Priority.BACKGROUND,
+        policy=policy,
+    )
+    return response.text.strip()
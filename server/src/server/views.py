@@ -1,17 +1,31 @@
 from aiohttp import web
-from google import genai
+import asyncio
+import base64
+import json
 import logging
-from .utils import (
-    start_chat,
-    send_chat_message,
-    generate_text_content,
+from datetime import datetime
+from .utils import PhaseError
+from .scheduler import ModelOverloaded
+from .debate import (
+    start_debate,
+    process_turn,
+    close_debate,
+    judge_debate,
+    JudgmentError,
+    SaveFailed,
+    finish_background_task,
 )
+from .sse import prepare_event_stream, send_event
+from .serialization import json_response, serialize, serialize_many
+from .compression import strip_encoding
+from .idempotency import idempotent
+from .jobs import enqueue_job
 from src.database.database import (
     async_session,
-    create_item,
     get_item_by_id,
-    update_item,
-    get_items_by_filters,
+    get_debate_log_entries,
+    get_user_debate_page,
+    VersionConflict,
 )
 import src.database.models as db_models
 
@@ -29,6 +43,11 @@ from .schemas import (
     GetDebateResponse,
     GetUserDebatesResponse,
     GetUserDebatesRequest,
+    DebateSummary,
+    StreamRequest,
+    EnqueueJobResponse,
+    GetJobRequest,
+    GetJobResponse,
 )
 from aiohttp_apispec import (
     docs,
@@ -38,6 +57,50 @@ from aiohttp_apispec import (
 
 logger = logging.getLogger(__name__)
 
+DEBATE_RELATIONSHIPS = ["log_entries"]
+
+
+def phase_error_body(error: PhaseError) -> dict:
+    return {
+        "error": f"Model call failed during {error.phase}.",
+        "failed_sides": sorted(error.failures),
+    }
+
+
+def phase_error_response(error: PhaseError) -> web.Response:
+    return web.json_response(phase_error_body(error), status=502)
+
+
+def overloaded_body(error: ModelOverloaded) -> dict:
+    return {
+        "error": "Too many requests to the model right now. Try again shortly.",
+        "retry_after": error.retry_after,
+    }
+
+
+def overloaded_response(error: ModelOverloaded) -> web.Response:
+    return web.json_response(
+        overloaded_body(error),
+        status=503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+VERSION_CONFLICT_BODY = {
+    "error": "Debate was changed by another request. Reload it and try again."
+}
+
+
+def version_conflict_response() -> web.Response:
+    return web.json_response(VERSION_CONFLICT_BODY, status=409)
+
+
+SAVE_FAILED_BODY = {"error": "Could not save the debate. Try again."}
+
+
+def save_failed_response() -> web.Response:
+    return web.json_response(SAVE_FAILED_BODY, status=500)
+
 
 @docs(
     tags=["start debate"],
@@ -50,99 +113,24 @@ logger = logging.getLogger(__name__)
         },
         404: {"description": "Not found"},
         422: {"description": "Validation error"},
+        502: {"description": "Model call failed"},
+        503: {"description": "Model calls overloaded, see Retry-After"},
     },
 )
 @request_schema(StartDebateRequest)
 async def start_debate_view(request) -> web.Response:
-    user_id = request["user_id"]
-    api_key = request.app["api_key"]
-    text_model_name = request.app["text_model_name"]
-    max_sentences = request.app["max_sentences"]
-
     data = request["data"]
     topic = data["topic"]
-    debate_logs = []
-
-    pro_client = genai.Client(api_key=api_key)
-    con_client = genai.Client(api_key=api_key)
-
-    initial_prompt = f"Debate topic: {topic}. Pro side will argue in favor, Con side will argue against. I, the moderator will manage the debate."
-
-    pro_side_chat = start_chat(
-        pro_client,
-        system_instructions=f"{initial_prompt} You are on the pro side of a debate. Your goal is to argue for the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-    )
-    con_side_chat = start_chat(
-        con_client,
-        system_instructions=f"{initial_prompt} You are on the con side of a debate. Your goal is to argue against the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-    )
-
-    pro_side_response = (
-        await send_chat_message(
-            pro_side_chat, f"Opening statement for the debate topic: {topic}"
-        )
-    ).text
-    con_side_response = (
-        await send_chat_message(
-            con_side_chat, f"Opening statement for the debate topic: {topic}"
-        )
-    ).text
-
-    debate_logs.append(
-        {
-            "speaker": "moderator",
-            "response_type": "opening_statement",
-            "text": initial_prompt,
-        }
-    )
-    debate_logs.append(
-        {
-            "speaker": "pro",
-            "response_type": "opening_statement",
-            "text": pro_side_response,
-        }
-    )
-    debate_logs.append(
-        {
-            "speaker": "con",
-            "response_type": "opening_statement",
-            "text": con_side_response,
-        }
-    )
-    async with async_session() as session:
-        pro_side_chat_history = [
-            content.dict() for content in pro_side_chat.get_history()
-        ]
-        con_side_chat_history = [
-            content.dict() for content in con_side_chat.get_history()
-        ]
-        debate: db_models.Debate = await create_item(
-            session,
-            {
-                "topic": topic,
-                "user_id": user_id,
-                "logs": debate_logs,
-                "pro_chat_history": pro_side_chat_history,
-                "con_chat_history": con_side_chat_history,
-            },
-            db_models.Debate,
-        )
-
-    response_data = StartDebateResponse().dump(
-        {
-            "message": "Debate started",
-            "debate_id": debate.id,
-            "topic": topic,
-            "pro_initial": pro_side_response,
-            "con_initial": con_side_response,
-            "logs": debate_logs,
-        }
-    )
-
+    try:
+        result = await start_debate(request.app, request["user_id"], topic)
+    except PhaseError as e:
+        return phase_error_response(e)
+    except ModelOverloaded as e:
+        return overloaded_response(e)
+
+    response_data = serialize(StartDebateResponse, result)
     logger.info(f"Debate started with topic: {topic}, response data: {response_data}")
-    return web.json_response(response_data, status=200)
+    return json_response(response_data, status=200)
 
 
 @docs(
@@ -156,133 +144,39 @@ async def start_debate_view(request) -> web.Response:
         },
         400: {"description": "Bad request"},
         404: {"description": "Not found"},
-        422: {"description": "Validation error"},
+        409: {"description": "Debate changed concurrently or request in progress"},
+        422: {"description": "Validation error or reused Idempotency-Key"},
+        500: {"description": "Debate could not be saved"},
+        502: {"description": "Model call failed"},
+        503: {"description": "Model calls overloaded, see Retry-After"},
     },
 )
 @request_schema(ProcessTurnRequest)
+@idempotent
 async def process_turn_view(request) -> web.Response:
-    max_sentences = request.app["max_sentences"]
-    api_key = request.app["api_key"]
-    text_model_name = request.app["text_model_name"]
     data = request["data"]
-    question = data["question"]
     debate_id = data["debate_id"]
 
-    async with async_session() as session:
-        debate: db_models.Debate = await get_item_by_id(
-            session, debate_id, db_models.Debate
-        )
-    if not debate:
-        return web.json_response({"error": "Debate not found"}, status=404)
-
-    pro_client = genai.Client(api_key=api_key)
-    con_client = genai.Client(api_key=api_key)
-    pro_client_chat = start_chat(
-        pro_client,
-        system_instructions=f"{debate.topic} You are on the pro side of a debate. Your goal is to argue for the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-        history=debate.pro_chat_history or [],
-    )
-    con_client_chat = start_chat(
-        con_client,
-        system_instructions=f"{debate.topic} You are on the con side of a debate. Your goal is to argue against the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-        history=debate.con_chat_history or [],
-    )
-
-    if not pro_client_chat or not con_client_chat:
-        return web.json_response(
-            {"error": "Chat not initialized. Start debate first."}, status=400
-        )
+    async with request.app["debate_locks"].hold(debate_id):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, debate_id, db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
 
-    debate_logs = debate.logs
+        try:
+            result = await process_turn(request.app, debate, data["question"])
+        except PhaseError as e:
+            return phase_error_response(e)
+        except ModelOverloaded as e:
+            return overloaded_response(e)
+        except VersionConflict:
+            return version_conflict_response()
+        except SaveFailed:
+            return save_failed_response()
 
-    pro_side_response = (
-        await send_chat_message(
-            pro_client_chat,
-            f"Respond to the question in favour of: {question}. Provide your argument in {max_sentences} sentences.",
-        )
-    ).text
-    con_side_response = (
-        await send_chat_message(
-            con_client_chat,
-            f"Respond to the question in opposition to: {question}. Provide your argument in {max_sentences} sentences.",
-        )
-    ).text
-    debate_logs.append(
-        {
-            "speaker": "moderator",
-            "response_type": "intitial_question_response",
-            "text": question,
-        }
-    )
-    debate_logs.append(
-        {
-            "speaker": "pro",
-            "response_type": "intitial_question_response",
-            "text": pro_side_response,
-        }
-    )
-    debate_logs.append(
-        {
-            "speaker": "con",
-            "response_type": "intitial_question_response",
-            "text": con_side_response,
-        }
-    )
-    pro_side_rebuttal = (
-        await send_chat_message(
-            pro_client_chat,
-            f"Rebuttal to the con side's argument: {con_side_response}. Provide your rebuttal in {max_sentences} sentences.",
-        )
-    ).text
-    con_side_rebuttal = (
-        await send_chat_message(
-            con_client_chat,
-            f"Rebuttal to the pro side's argument: {pro_side_response}. Provide your rebuttal in {max_sentences} sentences.",
-        )
-    ).text
-    debate_logs.append(
-        {
-            "speaker": "pro",
-            "response_type": "rebuttal",
-            "text": pro_side_rebuttal,
-        }
-    )
-    debate_logs.append(
-        {
-            "speaker": "con",
-            "response_type": "rebuttal",
-            "text": con_side_rebuttal,
-        }
-    )
-    debate.logs = debate_logs
-    questions = debate.questions
-    questions.append(question)
-    async with async_session() as session:
-        pro_chat_history = [content.dict() for content in pro_client_chat.get_history()]
-        con_chat_history = [content.dict() for content in con_client_chat.get_history()]
-        update_dict = {
-            "logs": debate.logs,
-            "questions": questions,
-            "pro_chat_history": pro_chat_history,
-            "con_chat_history": con_chat_history,
-        }
-        await update_item(session, debate.id, update_dict, db_models.Debate)
-
-    response_data = ProcessTurnResponse().dump(
-        {
-            "message": "Turn processed",
-            "question": question,
-            "pro_side_response": pro_side_response,
-            "con_side_response": con_side_response,
-            "pro_side_rebuttal": pro_side_rebuttal,
-            "con_side_rebuttal": con_side_rebuttal,
-            "logs": debate.logs,
-            "questions": debate.questions,
-        }
-    )
-    return web.json_response(response_data)
+        return json_response(serialize(ProcessTurnResponse, result))
 
 
 @docs(
@@ -296,108 +190,40 @@ async def process_turn_view(request) -> web.Response:
         },
         400: {"description": "Bad request"},
         404: {"description": "Not found"},
-        422: {"description": "Validation error"},
+        409: {"description": "Debate changed concurrently or request in progress"},
+        422: {"description": "Validation error or reused Idempotency-Key"},
+        500: {"description": "Debate could not be saved"},
+        502: {"description": "Model call failed"},
+        503: {"description": "Model calls overloaded, see Retry-After"},
     },
 )
 @request_schema(ClosingArgmentRequest)
+@idempotent
 async def closing_arguments_view(request) -> web.Response:
-    api_key = request.app["api_key"]
-    text_model_name = request.app["text_model_name"]
-    max_sentences = request.app["max_sentences"]
-
     data = request["data"]
     debate_id: int = data["debate_id"]
-    async with async_session() as session:
-        debate: db_models.Debate = await get_item_by_id(
-            session, debate_id, db_models.Debate
-        )
-    if not debate:
-        return web.json_response({"error": "Debate not found"}, status=404)
-    if not debate.topic:
-        return web.json_response({"error": "Debate not started"}, status=400)
-
-    pro_client = genai.Client(api_key=api_key)
-    con_client = genai.Client(api_key=api_key)
-    pro_client_chat = start_chat(
-        pro_client,
-        system_instructions=f"{debate.topic} You are on the pro side of a debate. Your goal is to argue for the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-        history=debate.pro_chat_history or [],
-    )
-    con_client_chat = start_chat(
-        con_client,
-        system_instructions=f"{debate.topic} You are on the con side of a debate. Your goal is to argue against the topic. Be logical and persuasive. Respond to the opposing side's arguments. Only ever respond with {max_sentences} sentences. Do not include any other information.",
-        model=text_model_name,
-        history=debate.con_chat_history or [],
-    )
-
-    if not pro_client_chat or not con_client_chat:
-        return web.json_response(
-            {"error": "Chat not initialized. Start debate first."}, status=400
-        )
-
-    pro_closing = (
-        await send_chat_message(
-            pro_client_chat,
-            f"Provide your closing argument for the debate in {max_sentences} sentences.",
-        )
-    ).text
-
-    con_closing = (
-        await send_chat_message(
-            con_client_chat,
-            f"Provide your closing argument for the debate in {max_sentences} sentences.",
-        )
-    ).text
+    async with request.app["debate_locks"].hold(debate_id):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, debate_id, db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+        if not debate.topic:
+            return web.json_response({"error": "Debate not started"}, status=400)
 
-    debate.logs.append(
-        {
-            "speaker": "moderator",
-            "response_type": "closing_argument",
-            "text": "We will now hear the closing arguments from both sides.",
-        }
-    )
+        try:
+            result = await close_debate(request.app, debate)
+        except PhaseError as e:
+            return phase_error_response(e)
+        except ModelOverloaded as e:
+            return overloaded_response(e)
+        except VersionConflict:
+            return version_conflict_response()
+        except SaveFailed:
+            return save_failed_response()
 
-    debate.logs.append(
-        {
-            "speaker": "pro",
-            "response_type": "closing_argument",
-            "text": pro_closing,
-        }
-    )
-    debate.logs.append(
-        {
-            "speaker": "con",
-            "response_type": "closing_argument",
-            "text": con_closing,
-        }
-    )
-    async with async_session() as session:
-        pro_chat_history = [content.dict() for content in pro_client_chat.get_history()]
-        con_chat_history = [content.dict() for content in con_client_chat.get_history()]
-        await update_item(
-            session,
-            debate.id,
-            {
-                "logs": debate.logs,
-                "pro_chat_history": pro_chat_history,
-                "con_chat_history": con_chat_history,
-            },
-            db_models.Debate,
-        )
-    logger.info(
-        f"Closing arguments processed for debate ID {debate_id}: Pro: {pro_closing}, Con: {con_closing}"
-    )
-    response_data = ClosingArgmentResponse().dump(
-        {
-            "message": "Closing arguments processed",
-            "pro_closing": pro_closing,
-            "con_closing": con_closing,
-            "logs": debate.logs,
-            "questions": debate.questions,
-        }
-    )
-    return web.json_response(response_data)
+        return json_response(serialize(ClosingArgmentResponse, result))
 
 
 @docs(
@@ -411,97 +237,324 @@ async def closing_arguments_view(request) -> web.Response:
         },
         400: {"description": "Bad request"},
         404: {"description": "Not found"},
-        422: {"description": "Validation error"},
+        409: {"description": "Debate changed concurrently or request in progress"},
+        422: {"description": "Validation error or reused Idempotency-Key"},
+        500: {"description": "Judgment failed or debate could not be saved"},
+        503: {"description": "Model calls overloaded, see Retry-After"},
     },
 )
 @request_schema(JudgeDebateRequest)
+@idempotent
 async def judge_debate_view(request) -> web.Response:
-    api_key = request.app["api_key"]
     data = request["data"]
     debate_id = data["debate_id"]
+    async with request.app["debate_locks"].hold(debate_id):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, debate_id, db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+        if not debate.topic:
+            return web.json_response({"error": "Debate not started"}, status=400)
+        if not debate.logs:
+            return web.json_response({"error": "No debate logs found"}, status=400)
+
+        try:
+            result = await judge_debate(request.app, debate)
+        except JudgmentError as e:
+            return web.json_response({"error": str(e)}, status=500)
+        except ModelOverloaded as e:
+            return overloaded_response(e)
+        except VersionConflict:
+            return version_conflict_response()
+        except SaveFailed:
+            return save_failed_response()
+
+        return json_response(serialize(JudgeDebateResponse, result))
+
+
+async def stream_phase(request, run, response_schema) -> web.StreamResponse:
+    """
+    Runs a debate phase while streaming it to the client as Server-Sent Events:
+    a "log" event per debate log entry as soon as it exists, "token" events
+    with partial model output when stream_tokens is set, then a final "done"
+    event carrying the regular response body (or an "error" event). If the
+    client disconnects, later events are dropped but the phase still runs to
+    completion and is saved.
+    """
+    stream_tokens = request["querystring"]["stream_tokens"]
+    response = await prepare_event_stream(request)
+    connected = True
+
+    async def emit(event: str, data: dict):
+        nonlocal connected
+        if not connected:
+            return
+        try:
+            await send_event(response, event, data)
+        except ConnectionResetError:
+            connected = False
+            logger.info(f"Client left the {request.path} event stream.")
+
+    phase = asyncio.ensure_future(run(emit, stream_tokens))
+    try:
+        result = await asyncio.shield(phase)
+    except asyncio.CancelledError:
+        # With handler cancellation on, aiohttp cancels the handler when the
+        # client goes away; the phase carries on and saves its turn alone.
+        request.app["background_tasks"].add(phase)
+        phase.add_done_callback(finish_background_task(request.app))
+        raise
+    except PhaseError as e:
+        await emit("error", phase_error_body(e))
+    except JudgmentError as e:
+        await emit("error", {"error": str(e)})
+    except ModelOverloaded as e:
+        await emit("error", overloaded_body(e))
+    except VersionConflict:
+        await emit("error", VERSION_CONFLICT_BODY)
+    except SaveFailed:
+        await emit("error", SAVE_FAILED_BODY)
+    else:
+        await emit("done", serialize(response_schema, result))
+    if connected:
+        try:
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+    return response
+
+
+@docs(
+    tags=["start debate"],
+    summary="Starts a new debate, streaming progress",
+    description="Streams the opening of a new debate as Server-Sent Events.",
+    responses={200: {"description": "text/event-stream of log and done events"}},
+)
+@request_schema(StartDebateRequest)
+@querystring_schema(StreamRequest)
+async def start_debate_stream_view(request) -> web.StreamResponse:
+    data = request["data"]
+
+    async def run(emit, stream_tokens):
+        return await start_debate(
+            request.app, request["user_id"], data["topic"], emit, stream_tokens
+        )
+
+    return await stream_phase(request, run, StartDebateResponse)
+
+
+@docs(
+    tags=["process turn"],
+    summary="Processes a turn in the debate, streaming progress",
+    description="Streams a debate turn as Server-Sent Events.",
+    responses={
+        200: {"description": "text/event-stream of log and done events"},
+        404: {"description": "Not found"},
+    },
+)
+@request_schema(ProcessTurnRequest)
+@querystring_schema(StreamRequest)
+async def process_turn_stream_view(request) -> web.StreamResponse:
+    data = request["data"]
+    async with request.app["debate_locks"].hold(data["debate_id"]):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, data["debate_id"], db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+
+        async def run(emit, stream_tokens):
+            return await process_turn(
+                request.app, debate, data["question"], emit, stream_tokens
+            )
+
+        return await stream_phase(request, run, ProcessTurnResponse)
+
+
+@docs(
+    tags=["closing arguments"],
+    summary="Processes closing arguments, streaming progress",
+    description="Streams the closing arguments as Server-Sent Events.",
+    responses={
+        200: {"description": "text/event-stream of log and done events"},
+        400: {"description": "Bad request"},
+        404: {"description": "Not found"},
+    },
+)
+@request_schema(ClosingArgmentRequest)
+@querystring_schema(StreamRequest)
+async def closing_arguments_stream_view(request) -> web.StreamResponse:
+    data = request["data"]
+    async with request.app["debate_locks"].hold(data["debate_id"]):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, data["debate_id"], db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+        if not debate.topic:
+            return web.json_response({"error": "Debate not started"}, status=400)
+
+        async def run(emit, stream_tokens):
+            return await close_debate(request.app, debate, emit, stream_tokens)
+
+        return await stream_phase(request, run, ClosingArgmentResponse)
+
+
+@docs(
+    tags=["judge debate"],
+    summary="Judges the debate, streaming progress",
+    description="Streams the judgment as Server-Sent Events.",
+    responses={
+        200: {"description": "text/event-stream of log and done events"},
+        400: {"description": "Bad request"},
+        404: {"description": "Not found"},
+    },
+)
+@request_schema(JudgeDebateRequest)
+@querystring_schema(StreamRequest)
+async def judge_debate_stream_view(request) -> web.StreamResponse:
+    data = request["data"]
+    async with request.app["debate_locks"].hold(data["debate_id"]):
+        async with async_session() as session:
+            debate: db_models.Debate = await get_item_by_id(
+                session, data["debate_id"], db_models.Debate, DEBATE_RELATIONSHIPS
+            )
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+        if not debate.topic:
+            return web.json_response({"error": "Debate not started"}, status=400)
+        if not debate.logs:
+            return web.json_response({"error": "No debate logs found"}, status=400)
+
+        async def run(emit, stream_tokens):
+            # The judgment is a single word, so there is nothing to token-stream.
+            return await judge_debate(request.app, debate, emit)
+
+        return await stream_phase(request, run, JudgeDebateResponse)
+
+
+async def enqueue_debate_job(request, kind: str) -> web.Response:
+    data = request["data"]
     async with async_session() as session:
         debate: db_models.Debate = await get_item_by_id(
-            session, debate_id, db_models.Debate
+            session, data["debate_id"], db_models.Debate, DEBATE_RELATIONSHIPS
         )
     if not debate:
         return web.json_response({"error": "Debate not found"}, status=404)
     if not debate.topic:
         return web.json_response({"error": "Debate not started"}, status=400)
-    if not debate.logs:
+    if kind == "judge" and not debate.logs:
         return web.json_response({"error": "No debate logs found"}, status=400)
 
-    moderator_client = genai.Client(api_key=api_key)
-    judgment_prompt = f"Based on the debate about {debate.topic}, provide a final judgment on who won the debate. Consider all arguments and rebuttals. Give one word answer: 'pro' or 'con'. Here is the transcript of the debate: {debate.logs}"
-
-    judgment = (
-        await generate_text_content(
-            moderator_client,
-            judgment_prompt,
-            request.app["text_model_name"],
-            "You are a debate judge. Analyze the debate transcript and provide a final judgment on who won the debate.",
-        )
-        .text.strip()
-        .lower()
+    job = await enqueue_job(request.app, request["user_id"], debate.id, kind)
+    if job is None:
+        return web.json_response({"error": "Could not queue job"}, status=500)
+    response_data = serialize(
+        EnqueueJobResponse, {"job_id": job.id, "status": job.status}
     )
+    return json_response(response_data, status=202)
 
-    if judgment not in ["pro", "con"]:
-        if "pro" in judgment:
-            judgment = "pro"
-        elif "con" in judgment:
-            judgment = "con"
-        else:
-            return web.json_response(
-                {
-                    "error": f"Invalid judgment received from model: {judgment}. Expected 'pro' or 'con'."
-                },
-                status=500,
-            )
 
-    debate.logs.append(
-        {
-            "speaker": "moderator",
-            "response_type": "narration",
-            "text": "We will now hear the final judgment on the debate.",
-        }
-    )
+@docs(
+    tags=["closing arguments"],
+    summary="Queues closing arguments",
+    description="Queues the closing arguments to run in the background and returns a job id to poll with /get_job.",
+    responses={
+        202: {"schema": EnqueueJobResponse, "description": "Job queued"},
+        400: {"description": "Bad request"},
+        404: {"description": "Not found"},
+        422: {"description": "Validation error or reused Idempotency-Key"},
+        500: {"description": "Job could not be queued"},
+    },
+)
+@request_schema(ClosingArgmentRequest)
+@idempotent
+async def closing_arguments_job_view(request) -> web.Response:
+    return await enqueue_debate_job(request, "close")
 
-    debate.logs.append(
-        {
-            "speaker": "moderator",
-            "response_type": "judgment",
-            "text": f"Judgment: The winner is {judgment}.",
-        }
-    )
+
+@docs(
+    tags=["judge debate"],
+    summary="Queues the judgment",
+    description="Queues the judgment to run in the background and returns a job id to poll with /get_job.",
+    responses={
+        202: {"schema": EnqueueJobResponse, "description": "Job queued"},
+        400: {"description": "Bad request"},
+        404: {"description": "Not found"},
+        422: {"description": "Validation error or reused Idempotency-Key"},
+        500: {"description": "Job could not be queued"},
+    },
+)
+@request_schema(JudgeDebateRequest)
+@idempotent
+async def judge_debate_job_view(request) -> web.Response:
+    return await enqueue_debate_job(request, "judge")
+
+
+@docs(
+    tags=["jobs"],
+    summary="Retrieves a background job",
+    description="Retrieves the status of a queued job and, once it has succeeded, its result.",
+    responses={
+        200: {"schema": GetJobResponse, "description": "Job status"},
+        404: {"description": "Job not found"},
+        422: {"description": "Validation error"},
+    },
+)
+@querystring_schema(GetJobRequest)
+async def get_job(request) -> web.Response:
+    job_id: int = request["querystring"]["job_id"]
     async with async_session() as session:
-        await update_item(
-            session,
-            debate.id,
-            {"logs": debate.logs, "winner": judgment},
-            db_models.Debate,
-        )
-    logger.info(f"Debate judged: {judgment}")
-    response_data = JudgeDebateResponse().dump(
+        job: db_models.Job = await get_item_by_id(session, job_id, db_models.Job)
+    if not job or job.user_id != request["user_id"]:
+        return web.json_response({"error": "Job not found"}, status=404)
+    response_data = serialize(
+        GetJobResponse,
         {
-            "message": "Debate judged",
-            "judgment": judgment,
-            "logs": debate.logs,
-            "questions": debate.questions,
-            "winner": judgment,
-        }
+            "job_id": job.id,
+            "debate_id": job.debate_id,
+            "kind": job.kind,
+            "status": job.status,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error,
+        },
     )
+    return json_response(response_data)
+
+
+def debate_etag(debate: db_models.Debate, since: int = None) -> str:
+    """
+    Every write to a debate bumps its version, so (id, version) identifies the
+    full representation; a delta also depends on where it starts.
+    """
+    etag = f"debate-{debate.id}-v{debate.version}"
+    return etag if since is None else f"{etag}-s{since}"
 
-    return web.json_response(response_data)
+
+def etag_matches(request: web.Request, etag: str) -> bool:
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored, and
+    # any compressed variant of the representation matches too.
+    return any(strip_encoding(tag.value) in (etag, "*") for tag in if_none_match)
 
 
 @docs(
     tags=["get debate"],
     summary="Retrieves a debate by ID",
-    description="Retrieves the details of a debate by its ID.",
+    description="Retrieves the details of a debate by its ID. Pass the returned cursor as since to get only the log entries added after it, and the returned ETag as If-None-Match to get a 304 when nothing changed.",
     responses={
         200: {
             "schema": GetDebateResponse,
             "description": "Success response with debate details",
         },
+        304: {"description": "Debate unchanged since the If-None-Match ETag"},
         404: {"description": "Debate not found"},
         422: {"description": "Validation error"},
     },
@@ -510,62 +563,88 @@ async def judge_debate_view(request) -> web.Response:
 async def get_debate(request) -> web.Response:
     query_params = request["querystring"]
     debate_id: int = query_params["debate_id"]
+    since: int = query_params["since"]
     async with async_session() as session:
         debate: db_models.Debate = await get_item_by_id(
             session, debate_id, db_models.Debate
         )
-    if not debate:
-        return web.json_response({"error": "Debate not found"}, status=404)
-    response_data = GetDebateResponse().dump(
+        if not debate:
+            return web.json_response({"error": "Debate not found"}, status=404)
+        etag = debate_etag(debate, since)
+        headers = {"Cache-Control": "private, no-cache"}
+        if etag_matches(request, etag):
+            response = web.Response(status=304, headers=headers)
+            response.etag = etag
+            return response
+        # Entries are read after the version, so a turn landing in between
+        # can only make the body newer than its ETag, never older.
+        entries = await get_debate_log_entries(session, debate_id, since or 0)
+    if debate.winner is not None:
+        # Judged debates no longer change, so their compressed bodies can be
+        # cached by ETag.
+        request["immutable"] = True
+    response_data = serialize(
+        GetDebateResponse,
         {
-            "debate_id": debate.id,
+            "id": debate.id,
+            "user_id": debate.user_id,
             "topic": debate.topic,
-            "logs": debate.logs,
+            "logs": [entry.to_dict() for entry in entries],
             "questions": debate.questions,
             "winner": debate.winner,
-        }
+            "cursor": entries[-1].seq + 1 if entries else since or 0,
+        },
     )
-    return web.json_response(response_data, status=200)
+    response = json_response(response_data, status=200, headers=headers)
+    response.etag = etag
+    return response
+
+
+def encode_cursor(created_at: datetime, debate_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), debate_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, debate_id = json.loads(base64.urlsafe_b64decode(cursor))
+    return datetime.fromisoformat(created_at), int(debate_id)
 
 
 @docs(
     tags=["get user debates"],
-    summary="Retrieves all debates for a user",
-    description="Retrieves all debates associated with a specific user.",
+    summary="Lists a user's debates",
+    description="Lists the user's debates newest first, one page at a time. Pass the returned next_cursor as cursor to get the next page, and fields (comma-separated) to choose the columns returned.",
     responses={
         200: {
             "schema": GetUserDebatesResponse,
-            "description": "Success response with list of debates",
+            "description": "Success response with a page of debates",
         },
-        404: {"description": "User not found"},
+        400: {"description": "Invalid cursor"},
         422: {"description": "Validation error"},
     },
 )
 @querystring_schema(GetUserDebatesRequest)
 async def get_user_debates(request) -> web.Response:
     user_id = request["user_id"]
+    query_params = request["querystring"]
+    limit: int = query_params["limit"]
+    columns = query_params["projection"].split(",")
+    after = None
+    if query_params["cursor"]:
+        try:
+            after = decode_cursor(query_params["cursor"])
+        except (ValueError, TypeError):
+            return web.json_response({"error": "Invalid cursor"}, status=400)
+
     async with async_session() as session:
-        filters = {"user_id": user_id}
-        debates: list[db_models.Debate] = await get_items_by_filters(
-            session,
-            db_models.Debate,
-            **filters,
-        )
-    if not debates:
-        return web.json_response({"debates": []})
-    response_data = GetUserDebatesResponse().dump(
-        {
-            "debates": [
-                {
-                    "id": debate.id,
-                    "user_id": debate.user_id,
-                    "topic": debate.topic,
-                    "questions": debate.questions,
-                    "logs": debate.logs,
-                    "winner": debate.winner,
-                }
-                for debate in debates
-            ]
-        }
-    )
-    return web.json_response(response_data, status=200)
+        # One extra row tells us whether there is a next page.
+        rows = await get_user_debate_page(session, user_id, columns, limit + 1, after)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    response_data = {
+        "debates": serialize_many(DebateSummary, rows, only=columns),
+        "next_cursor": next_cursor,
+    }
+    return json_response(response_data, status=200)
@@ -0,0 +1,71 @@
+import asyncio
+import time
+import unittest
+
+from src.server.call_policy import ModelCallPolicy
+from src.server.scheduler import ModelScheduler, Priority
+
+
+class CallDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_retries_share_one_deadline(self):
+        policy = ModelCallPolicy(timeout=0.2, max_retries=5, backoff_base=0)
+
+        async def request():
+            await asyncio.sleep(1)
+
+        started = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await policy.call(request, hedge=False)
+        # Six attempts of 0.2s each would take 1.2s.
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(policy.failures, 1)
+
+    async def test_no_backoff_past_the_deadline(self):
+        policy = ModelCallPolicy(timeout=0.2, max_retries=5, backoff_base=10)
+
+        async def request():
+            raise asyncio.TimeoutError()
+
+        started = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await policy.call(request, hedge=False)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    async def test_queue_wait_counts_against_the_deadline(self):
+        policy = ModelCallPolicy(timeout=0.2, max_retries=5, backoff_base=0)
+        scheduler = ModelScheduler(max_concurrency=1)
+
+        async def hold_slot():
+            async with scheduler.slot(Priority.INTERACTIVE):
+                await asyncio.sleep(1)
+
+        async def request():
+            return "ok"
+
+        holder = asyncio.ensure_future(hold_slot())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            await policy.call(request, scheduler, hedge=False)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(policy.attempts, 0)
+        self.assertEqual(scheduler.waiters, [])
+        self.assertEqual(scheduler.queue_depth(), 0)
+        holder.cancel()
+
+    async def test_retry_within_the_deadline_succeeds(self):
+        policy = ModelCallPolicy(timeout=1, max_retries=2, backoff_base=0)
+        calls = []
+
+        async def request():
+            calls.append(1)
+            if len(calls) == 1:
+                raise asyncio.TimeoutError()
+            return "ok"
+
+        self.assertEqual(await policy.call(request, hedge=False), "ok")
+        self.assertEqual(policy.retries, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.server.schemas import ClosingArgmentResponse
+from src.server.views import stream_phase
+
+
+class UncancelledTestServer(TestServer):
+    # TestServer always cancels handlers on disconnect; web.run_app does not.
+    async def _make_runner(self, handler_cancellation=False, **kwargs):
+        return await super()._make_runner(handler_cancellation=False, **kwargs)
+
+
+class DisconnectTest(unittest.IsolatedAsyncioTestCase):
+    async def disconnect_mid_phase(self, server_class):
+        saved = asyncio.Event()
+        client_gone = asyncio.Event()
+
+        async def run(emit, stream_tokens):
+            await emit("log", {"text": "closing arguments"})
+            await client_gone.wait()
+            # What process_turn and close_debate do: keep emitting tokens and
+            # log entries, then persist the turn.
+            for _ in range(20):
+                await emit("token", {"speaker": "pro", "text": "word "})
+                await asyncio.sleep(0.01)
+            saved.set()
+            return {"message": "Closing arguments processed", "logs": []}
+
+        async def handler(request):
+            request["querystring"] = {"stream_tokens": True}
+            return await stream_phase(request, run, ClosingArgmentResponse)
+
+        app = web.Application()
+        app["background_tasks"] = set()
+        app.router.add_post("/closing_arguments/stream", handler)
+        async with TestClient(server_class(app)) as client:
+            response = await client.post("/closing_arguments/stream")
+            self.assertIn(b"event: log", await response.content.readline())
+            response.close()
+            client_gone.set()
+            await asyncio.wait_for(saved.wait(), 5)
+            await asyncio.gather(*app["background_tasks"])
+
+        self.assertTrue(saved.is_set())
+        self.assertFalse(app["background_tasks"])
+
+    async def test_phase_is_saved_when_the_handler_is_cancelled(self):
+        await self.disconnect_mid_phase(TestServer)
+
+    async def test_phase_is_saved_when_writes_fail(self):
+        await self.disconnect_mid_phase(UncancelledTestServer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from src.server.utils import compact_history, summary_exchange, window_start
+
+
+def turn(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def exchanges(count: int) -> list[dict]:
+    return [
+        content
+        for index in range(count)
+        for content in (turn("user", f"q{index}"), turn("model", f"a{index}"))
+    ]
+
+
+class HistoryWindowTest(unittest.TestCase):
+    def test_unsummarized_tail_is_kept_whole_within_budget(self):
+        history = exchanges(6)
+        self.assertEqual(compact_history(history, None, token_budget=1000), history)
+        self.assertEqual(
+            compact_history(history, "so far", token_budget=1000),
+            summary_exchange("so far") + history,
+        )
+
+    def test_exchanges_split_over_several_model_contents(self):
+        history = [
+            turn("user", "q0"),
+            turn("model", "a0 part one"),
+            turn("model", "a0 part two"),
+            *exchanges(2),
+        ]
+        # Keeping two exchanges drops the whole first one, not half of it.
+        self.assertEqual(window_start(history, 1000, keep_exchanges=2), 3)
+        self.assertEqual(window_start(history, 1000, keep_exchanges=5), 0)
+        self.assertEqual(window_start(history, 1000, keep_exchanges=0), len(history))
+
+    def test_over_budget_drops_oldest_exchanges_but_keeps_latest(self):
+        history = [turn("user", "x" * 400), turn("model", "y" * 400), *exchanges(1)]
+        self.assertEqual(compact_history(history, None, token_budget=50), history[2:])
+        self.assertEqual(compact_history(history, None, token_budget=0), history[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import unittest
+
+from src.server.jwks import JWKSCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeIdP:
+    """JWKS fetcher whose keys, failures and latency the test controls."""
+
+    def __init__(self, *kids: str):
+        self.kids = list(kids)
+        self.calls = 0
+        self.fail = False
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> dict:
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("identity provider unavailable")
+        return {"keys": [{"kid": kid} for kid in self.kids]}
+
+
+class JWKSCacheTest(unittest.IsolatedAsyncioTestCase):
+    def cache(self, idp: FakeIdP, clock: FakeClock) -> JWKSCache:
+        return JWKSCache(
+            idp, ttl=600, refresh_ahead=60, min_refetch_interval=30, clock=clock
+        )
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        idp, clock = FakeIdP("a"), FakeClock()
+        cache = self.cache(idp, clock)
+        idp.release.clear()
+        waiters = [asyncio.ensure_future(cache.get_key("a")) for _ in range(10)]
+        await asyncio.sleep(0)
+        idp.release.set()
+        self.assertEqual(await asyncio.gather(*waiters), [{"kid": "a"}] * 10)
+        self.assertEqual(idp.calls, 1)
+
+    async def test_refresh_ahead_serves_cached_keys_while_refetching(self):
+        idp, clock = FakeIdP("a"), FakeClock()
+        cache = self.cache(idp, clock)
+        await cache.get_jwks()
+
+        clock.now = 500
+        await cache.get_jwks()
+        self.assertEqual(idp.calls, 1)
+
+        clock.now = 550
+        idp.kids = ["b"]
+        idp.release.clear()
+        jwks = await cache.get_jwks()
+        self.assertEqual(jwks["keys"], [{"kid": "a"}])
+        await asyncio.sleep(0)
+        self.assertEqual(idp.calls, 2)
+
+        idp.release.set()
+        await cache._inflight
+        self.assertEqual(await cache.get_key("b"), {"kid": "b"})
+        self.assertEqual(cache.fetched_at, 550)
+        self.assertEqual(idp.calls, 2)
+
+    async def test_unknown_kid_refetches_at_most_once_per_interval(self):
+        idp, clock = FakeIdP("a"), FakeClock()
+        cache = self.cache(idp, clock)
+        await cache.get_jwks()
+
+        clock.now = 10
+        self.assertIsNone(await cache.get_key("rotated"))
+        self.assertIsNone(await cache.get_key("rotated"))
+        self.assertEqual(idp.calls, 1)
+
+        clock.now = 30
+        idp.kids = ["a", "rotated"]
+        self.assertEqual(await cache.get_key("rotated"), {"kid": "rotated"})
+        self.assertEqual(idp.calls, 2)
+
+        clock.now = 40
+        self.assertIsNone(await cache.get_key("bogus"))
+        self.assertEqual(idp.calls, 2)
+
+    async def test_stale_keys_are_served_when_the_idp_fails(self):
+        idp, clock = FakeIdP("a"), FakeClock()
+        cache = self.cache(idp, clock)
+        await cache.get_jwks()
+
+        clock.now = 700
+        idp.fail = True
+        self.assertEqual(await cache.get_key("a"), {"kid": "a"})
+        self.assertEqual(idp.calls, 2)
+
+        clock.now = 710
+        self.assertEqual(await cache.get_key("a"), {"kid": "a"})
+        self.assertEqual(idp.calls, 2)
+
+    async def test_first_fetch_failure_is_raised(self):
+        idp = FakeIdP("a")
+        idp.fail = True
+        with self.assertRaises(ConnectionError):
+            await self.cache(idp, FakeClock()).get_key("a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import asyncio
+import unittest
+
+from src.server.opening_pool import OpeningPair, OpeningPool
+
+
+class OpeningPoolTest(unittest.IsolatedAsyncioTestCase):
+    def pool(self, generated: list[str]) -> OpeningPool:
+        async def generate(topic: str) -> OpeningPair:
+            generated.append(topic)
+            return OpeningPair(f"pro on {topic}", f"con on {topic}", [], [])
+
+        return OpeningPool(
+            generate, asyncio.ensure_future, size=2, low_water=0, hot_threshold=2
+        )
+
+    async def test_pairs_are_served_for_the_topic_they_were_generated_from(self):
+        generated = []
+        pool = self.pool(generated)
+        topic = "Should AI be regulated?"
+        self.assertIsNone(pool.take(topic))
+        self.assertIsNone(pool.take(topic))
+        await asyncio.sleep(0)
+
+        self.assertEqual(generated, [topic, topic])
+        self.assertEqual(pool.take(topic).pro_text, f"pro on {topic}")
+
+    async def test_differently_worded_topics_do_not_share_pairs(self):
+        generated = []
+        pool = self.pool(generated)
+        pool.take("Should AI be regulated?")
+        pool.take("Should AI be regulated?")
+        await asyncio.sleep(0)
+
+        self.assertIsNone(pool.take("should ai be regulated"))
+        self.assertEqual(pool.misses, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import contextlib
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from src.server import debate as debate_module, jobs
+from src.server.debate import SaveFailed, save_turn
+
+
+@contextlib.asynccontextmanager
+async def no_session():
+    yield None
+
+
+def stored_debate():
+    return SimpleNamespace(id=7, version=3, log_entries=[])
+
+
+class SaveTurnTest(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_append_raises(self):
+        debate = stored_debate()
+        append = mock.AsyncMock(return_value=False)
+        with mock.patch.object(debate_module, "async_session", no_session):
+            with mock.patch.object(debate_module, "append_debate_entries", append):
+                with self.assertRaises(SaveFailed):
+                    await save_turn(debate, [{"text": "pro: hello"}])
+        self.assertEqual(debate.version, 3)
+
+    async def test_successful_append_bumps_the_version(self):
+        debate = stored_debate()
+        append = mock.AsyncMock(return_value=True)
+        with mock.patch.object(debate_module, "async_session", no_session):
+            with mock.patch.object(debate_module, "append_debate_entries", append):
+                await save_turn(debate, [{"text": "pro: hello"}])
+        self.assertEqual(debate.version, 4)
+
+    async def test_failed_save_requeues_the_job(self):
+        job = SimpleNamespace(id=1, kind="close", attempts=1, max_attempts=3)
+        execute = mock.AsyncMock(side_effect=SaveFailed("database down"))
+        finish = mock.AsyncMock(return_value=True)
+        with mock.patch.object(jobs, "async_session", no_session):
+            with mock.patch.object(jobs, "execute_job", execute):
+                with mock.patch.object(jobs, "finish_job", finish):
+                    await jobs.run_job(None, job)
+        self.assertEqual(finish.await_args.args[2], "queued")
+
+
+if __name__ == "__main__":
+    unittest.main()
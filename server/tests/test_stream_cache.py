@@ -0,0 +1,90 @@
+import unittest
+
+from google.genai.chats import AsyncChat
+from google.genai.types import (
+    Candidate,
+    Content,
+    FinishReason,
+    GenerateContentResponse,
+    Part,
+)
+
+from src.server.response_cache import MemoryResponseCache, ResponseCache
+from src.server.utils import send_chat_message, stream_chat_message
+
+CHUNKS = ["The pro side ", "argues that ", "the topic holds."]
+
+
+def chunk(text: str, last: bool = False) -> GenerateContentResponse:
+    return GenerateContentResponse(
+        candidates=[
+            Candidate(
+                content=Content(role="model", parts=[Part(text=text)]),
+                finish_reason=FinishReason.STOP if last else None,
+            )
+        ]
+    )
+
+
+class StreamingModels:
+    _api_client = None
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_stream(self, model, contents, config):
+        self.calls += 1
+
+        async def stream():
+            for index, text in enumerate(CHUNKS):
+                yield chunk(text, last=index == len(CHUNKS) - 1)
+
+        return stream()
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        return chunk("a fresh reply", last=True)
+
+
+def new_chat(models: StreamingModels) -> AsyncChat:
+    return AsyncChat(modules=models, model="test-model", config=None, history=[])
+
+
+class StreamCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_streamed_reply_is_cached_whole(self):
+        cache = ResponseCache(MemoryResponseCache())
+        streamed = []
+
+        async def on_text(text: str):
+            streamed.append(text)
+
+        models = StreamingModels()
+        chat = new_chat(models)
+        text = await stream_chat_message(chat, "Opening?", on_text, cache)
+        self.assertEqual(text, "".join(CHUNKS))
+        self.assertEqual(streamed, CHUNKS)
+        # The chat holds the reply as one model turn, not one per chunk.
+        self.assertEqual(
+            [content.role for content in chat.get_history()], ["user", "model"]
+        )
+        self.assertEqual(chat.get_history()[1].parts[0].text, "".join(CHUNKS))
+
+        # A later non-streamed call for the same request is a cache hit.
+        fresh = StreamingModels()
+        response = await send_chat_message(new_chat(fresh), "Opening?", cache)
+        self.assertEqual(fresh.calls, 0)
+        self.assertEqual(response.text, "".join(CHUNKS))
+
+        # So is a later stream, handed over as a single chunk.
+        replayed = []
+
+        async def on_replay(text: str):
+            replayed.append(text)
+
+        text = await stream_chat_message(new_chat(fresh), "Opening?", on_replay, cache)
+        self.assertEqual(fresh.calls, 0)
+        self.assertEqual(replayed, ["".join(CHUNKS)])
+
+
+if __name__ == "__main__":
+    unittest.main()